@@ -1,6 +1,17 @@
+import os
+import uuid
+import hashlib
+import threading
+
 import streamlit as st
+import metrics
 from chatbot import ConversationManager
+from history_store import SQLiteStore
+from response_cache import ResponseCache
 from resume_analyzer import ResumeAnalyzer
+from resume_cache import ResumeCache
+from scheduler import RequestScheduler
+from singleflight import SingleFlight
 
 
 st.set_page_config(
@@ -10,14 +21,95 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+
+@st.cache_resource
+def get_response_cache():
+    # Shared by every session so repeated questions are answered once.
+    return ResponseCache(max_entries=2048, ttl=24 * 3600, path="response_cache.db")
+
+
+@st.cache_resource
+def get_request_scheduler():
+    # One scheduler per process so every session shares the same Groq quota.
+    return RequestScheduler()
+
+
+@st.cache_resource
+def get_resume_cache():
+    # Keyed by file content, so re-analyzing an upload for another role skips parsing.
+    return ResumeCache()
+
+
+@st.cache_resource
+def get_single_flight():
+    # Identical prompts sent by several sessions at once share one Groq call.
+    return SingleFlight()
+
+
+CHAT_HISTORY_DB = "chat_history.db"
+CHAT_SESSION_MAX_AGE = 30 * 24 * 3600
+
+
+@st.cache_resource
+def expire_chat_sessions():
+    # Conversations nobody has written to for a month are deleted once per process start.
+    return SQLiteStore.purge_sessions(CHAT_HISTORY_DB, CHAT_SESSION_MAX_AGE)
+
+
+@st.cache_resource(max_entries=1000)
+def get_chat_session(session_id):
+    # One manager per conversation, shared by every tab that shows it, so no
+    # two managers hold diverging copies of the same history. The lock
+    # serializes turns coming from different tabs.
+    manager = ConversationManager(
+        history_file=CHAT_HISTORY_DB,
+        session_id=session_id,
+        durability="turn",
+        response_cache=get_response_cache(),
+        scheduler=get_request_scheduler(),
+        single_flight=get_single_flight()
+    )
+    return manager, threading.Lock()
+
+
+def chat_session_id():
+    """Signed-in users keep one conversation across reloads and tabs.
+
+    Without sign-in there is nothing to tie a reload to its earlier
+    conversation, so every browser session starts a new one.
+    """
+    user = getattr(st, "user", None)
+    if getattr(user, "is_logged_in", False) and getattr(user, "email", None):
+        return hashlib.sha256(user.email.encode("utf-8")).hexdigest()[:32]
+    return uuid.uuid4().hex
+
+
+@st.cache_resource
+def start_metrics_exporter():
+    # Set APP_METRICS=1 and APP_METRICS_PORT to scrape /metrics-style text from this process.
+    port = os.getenv("APP_METRICS_PORT")
+    if metrics.REGISTRY.enabled and port:
+        return metrics.start_http_server(int(port))
+    return None
+
+
+start_metrics_exporter()
+expire_chat_sessions()
+
 if "page" not in st.session_state:
     st.session_state.page = "dashboard"
 
 if "analyzer" not in st.session_state:
-    st.session_state.analyzer = ResumeAnalyzer()
+    st.session_state.analyzer = ResumeAnalyzer(cache=get_resume_cache())
+
+if "resume_results" not in st.session_state:
+    st.session_state.resume_results = None
+
+if "session_id" not in st.session_state:
+    st.session_state.session_id = chat_session_id()
 
-if "chatbot" not in st.session_state:
-    st.session_state.chatbot = ConversationManager()
+if "chat_pages" not in st.session_state:
+    st.session_state.chat_pages = 1
 
 
 st.markdown("""
@@ -221,7 +313,7 @@ def render_sidebar():
         if st.session_state.page == "chat":
             st.markdown("### ⚙️ Chat Settings")
 
-            chatbot = st.session_state.chatbot
+            chatbot, chat_lock = get_chat_session(st.session_state.session_id)
 
             persona = st.selectbox(
                 "Choose Persona",
@@ -229,11 +321,14 @@ def render_sidebar():
             )
 
             if st.button("Apply Persona"):
-                chatbot.set_persona(persona)
+                with chat_lock:
+                    chatbot.set_persona(persona)
                 st.success(f"Persona set to {persona}")
 
             if st.button("Clear Chat"):
-                chatbot.clear_history()
+                with chat_lock:
+                    chatbot.clear_history()
+                st.session_state.chat_pages = 1
                 st.rerun()
 
 
@@ -270,16 +365,31 @@ def render_dashboard():
             st.rerun()
 
 
+CHAT_PAGE_SIZE = 20
+
+
+def format_message(content):
+    if content.count("```") % 2:
+        # An unterminated code fence (e.g. an interrupted reply) would swallow the rest of the page.
+        content += "\n```"
+    return content
+
+
 def render_chat():
     st.title("🤖 AI Chat Assistant")
 
-    chatbot = st.session_state.chatbot
+    chatbot, chat_lock = get_chat_session(st.session_state.session_id)
 
-    for msg in chatbot.conversation_history:
-        if msg["role"] == "system":
-            continue
+    # Only the newest pages are fetched and drawn; older ones are read from
+    # the history store when asked for.
+    messages, older = chatbot.history_page(limit=st.session_state.chat_pages * CHAT_PAGE_SIZE)
+    if older is not None and st.button("Load older messages"):
+        st.session_state.chat_pages += 1
+        st.rerun()
+
+    for msg in messages:
         with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
+            st.markdown(format_message(msg["content"]))
 
     user_input = st.chat_input("Type your message...")
 
@@ -288,9 +398,13 @@ def render_chat():
             st.markdown(user_input)
 
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                reply = chatbot.chat_completion(user_input)
-                st.markdown(reply)
+            try:
+                with chat_lock:
+                    st.write_stream(chatbot.chat_completion_stream(user_input))
+            except Exception as e:
+                # Whatever was streamed stays on screen; the turn itself was not saved.
+                st.error(f"Reply interrupted: {e}")
+                return
 
         st.rerun()
 
@@ -319,8 +433,6 @@ def render_resume():
 
         analyze_btn = st.button("Analyze Resume", use_container_width=True)
 
-    results = None
-
     if analyze_btn:
         if not uploaded_file:
             st.error("Please upload a resume file.")
@@ -329,10 +441,13 @@ def render_resume():
         else:
             with st.spinner("Analyzing..."):
                 try:
-                    results = analyzer.analyze(uploaded_file, job_role)
+                    st.session_state.resume_results = analyzer.analyze(uploaded_file, job_role)
                 except Exception as e:
                     st.error(str(e))
 
+    # Kept in session state so the last analysis survives reruns.
+    results = st.session_state.resume_results
+
     with col2:
         if results:
             # Skill Match Score Section
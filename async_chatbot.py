@@ -0,0 +1,240 @@
+import time
+import asyncio
+
+import metrics
+from chatbot import ConversationManager
+from resources import get_async_groq_client
+from singleflight import Abandoned
+
+
+# Keeps relay tasks alive until they finish; the event loop only holds weak references.
+_relays = set()
+
+
+class AsyncConversationManager(ConversationManager):
+    """ConversationManager for asyncio servers.
+
+    Personas, token budget and history stores behave exactly as in
+    ConversationManager, but requests go through the async Groq client and
+    history writes run in a worker thread, so one event loop can keep many
+    conversations in flight. Turns of the same conversation are serialized.
+
+    Use ``await AsyncConversationManager.create(...)`` to keep the initial
+    history load off the event loop as well.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._turn_lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        return await asyncio.to_thread(cls, *args, **kwargs)
+
+    def _create_client(self, api_key):
+        return get_async_groq_client(api_key)
+
+    async def _persist(self, ops):
+        with metrics.timer("chat_history_save_seconds"):
+            await asyncio.to_thread(self.history_store.apply, ops)
+
+    async def save_conversation_history(self):
+        await self._persist([("reset", self.conversation_history)])
+
+    async def export_history(self, path):
+        await asyncio.to_thread(self.history_store.export_json, path)
+
+    async def history_page(self, before=None, limit=20):
+        return await asyncio.to_thread(self.history_store.page, before, limit)
+
+    async def close(self):
+        # Shuts down the summarizer's worker pool as well as the history store.
+        await asyncio.to_thread(super().close)
+
+    async def clear_history(self):
+        async with self._turn_lock:
+            self._reset_history()
+            await self._persist([("reset", self.conversation_history)])
+
+    async def set_persona(self, persona_name):
+        async with self._turn_lock:
+            message = self._persona_message(persona_name)
+            if message is not None:
+                await self._persist([("set", 0, message)])
+
+    async def _dispatch(self, params):
+        if self.scheduler is None:
+            return await self.client.chat.completions.create(**params)
+
+        return await self.scheduler.acreate(
+            self.client, params, session_id=self.session_id, estimated_tokens=self._estimated_tokens(params)
+        )
+
+    async def _create(self, params):
+        if self.router is None:
+            return await self._dispatch(params)
+
+        return await self.router.acall(
+            lambda model: self._dispatch({**params, "model": model}),
+            self._total_tokens,
+            self.current_persona,
+            stream=params.get("stream", False)
+        )
+
+    async def _send_attempt(self, params, model):
+        if model is None:
+            response = await self._create(params)
+        else:
+            response = await self._dispatch({**params, "model": model})
+        return response.choices[0].message.content
+
+    async def _send(self, params):
+        if self.hedger is not None:
+            return await self.hedger.acall(lambda model: self._send_attempt(params, model))
+
+        response = await self._create(params)
+        return response.choices[0].message.content
+
+    async def _send_stream(self, params):
+        stream = await self._create({**params, "stream": True})
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.close()
+
+    async def _send_shared(self, params, cache_key):
+        if self.single_flight is None:
+            return await self._send(params)
+
+        return await self.single_flight.ado(self._flight_key(params, cache_key), lambda: self._send(params))
+
+    async def _send_stream_shared(self, params, cache_key):
+        if self.single_flight is None:
+            async for delta in self._send_stream(params):
+                yield delta
+            return
+
+        key = self._flight_key(params, cache_key)
+        call, leader = self.single_flight.abegin(key)
+        if not leader:
+            sent = False
+            try:
+                async for delta in call.follow():
+                    sent = True
+                    yield delta
+            except Abandoned:
+                if sent:
+                    raise
+                self.single_flight.aleave(call)
+                call = None
+                async for delta in self._send_stream(params):
+                    yield delta
+            finally:
+                if call is not None:
+                    self.single_flight.aleave(call)
+            return
+
+        deltas = self._send_stream(params)
+        parts = []
+        try:
+            async for delta in deltas:
+                parts.append(delta)
+                call.publish(delta)
+                yield delta
+        except GeneratorExit:
+            if not self.single_flight.aabandon(key, call):
+                # Other sessions are still reading this reply; finish it for them.
+                task = asyncio.ensure_future(self._relay_stream(key, call, deltas, parts))
+                _relays.add(task)
+                task.add_done_callback(_relays.discard)
+            else:
+                await deltas.aclose()
+            raise
+        except BaseException as e:
+            self.single_flight.afinish(key, call, error=e if isinstance(e, Exception) else Abandoned())
+            raise
+        self.single_flight.afinish(key, call, "".join(parts))
+
+    async def _relay_stream(self, key, call, deltas, parts):
+        try:
+            async for delta in deltas:
+                parts.append(delta)
+                call.publish(delta)
+                if self.single_flight.aabandon(key, call):
+                    # Every follower has stopped reading too.
+                    await deltas.aclose()
+                    return
+        except Exception as e:
+            self.single_flight.afinish(key, call, error=e)
+            return
+        self.single_flight.afinish(key, call, "".join(parts))
+
+    async def chat_completion(self, user_prompt):
+        metrics.inc("chat_requests_total")
+        async with self._turn_lock:
+            checkpoint, user_message, dropped = self._start_turn(user_prompt)
+            params = self._request_params()
+            elapsed = None
+
+            try:
+                cache_key, assistant_reply = self._cache_lookup(params)
+                if assistant_reply is None:
+                    started = time.perf_counter()
+                    assistant_reply = await self._send_shared(params, cache_key)
+                    elapsed = time.perf_counter() - started
+                    self._cache_store(cache_key, assistant_reply)
+                else:
+                    metrics.inc("chat_cache_hits_total")
+            except BaseException:
+                metrics.inc("chat_errors_total")
+                self._rollback_turn(checkpoint)
+                raise
+
+            await self._persist(self._record_reply(user_message, dropped, assistant_reply))
+            if elapsed is not None:
+                self._record_generation(elapsed)
+
+            return assistant_reply
+
+    async def chat_completion_stream(self, user_prompt):
+        """Async counterpart of ConversationManager.chat_completion_stream()."""
+        metrics.inc("chat_requests_total")
+        async with self._turn_lock:
+            checkpoint, user_message, dropped = self._start_turn(user_prompt)
+            params = self._request_params()
+            parts = []
+            completed = False
+            elapsed = ttft = None
+
+            try:
+                cache_key, cached_reply = self._cache_lookup(params)
+                if cached_reply is not None:
+                    metrics.inc("chat_cache_hits_total")
+                    parts.append(cached_reply)
+                    yield cached_reply
+                else:
+                    started = time.perf_counter()
+                    async for delta in self._send_stream_shared(params, cache_key):
+                        if ttft is None:
+                            ttft = time.perf_counter() - started
+                        parts.append(delta)
+                        yield delta
+                    elapsed = time.perf_counter() - started
+                    self._cache_store(cache_key, "".join(parts))
+
+                completed = True
+            except BaseException:
+                metrics.inc("chat_errors_total")
+                raise
+            finally:
+                if not completed:
+                    self._rollback_turn(checkpoint)
+
+            await self._persist(self._record_reply(user_message, dropped, "".join(parts)))
+            if elapsed is not None:
+                self._record_generation(elapsed, ttft)
@@ -0,0 +1,289 @@
+"""Score many resumes against one or more job roles in parallel.
+
+Input is a directory (searched recursively for .pdf/.docx files) or a
+manifest listing one file per line. Files are extracted and scored in a
+process pool, and one record per (file, role) is appended to a JSONL or CSV
+file as soon as its file finishes, so an interrupted run picks up where it
+stopped when started again with the same output file.
+
+    python batch_analyze.py resumes/ --role "Python Developer" --role "Data Analyst" -o scores.jsonl
+    python batch_analyze.py manifest.txt --role "DevOps Engineer" -o scores.csv --workers 8
+"""
+import os
+import csv
+import json
+import time
+import signal
+import argparse
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+
+RESUME_EXTENSIONS = (".pdf", ".docx")
+CSV_FIELDS = ["file", "role", "match_score", "ats_score", "matching_skills", "missing_skills", "error"]
+FILE_TIMEOUT = 300
+WORKER_DIED = "BrokenProcessPool: a worker process died while this file was being analyzed"
+
+_analyzer = None
+_file_timeout = None
+
+
+def iter_resume_files(source):
+    """Yield resume paths from a directory tree or a manifest file, in a stable order."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(RESUME_EXTENSIONS) and not name.startswith("~$"):
+                    yield os.path.join(root, name)
+        return
+
+    # Manifest: one path per line, relative to the manifest's directory.
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield os.path.join(base, line)
+
+
+def _init_worker(file_timeout=None):
+    global _analyzer, _file_timeout
+    from resume_analyzer import ResumeAnalyzer
+
+    # Files are already spread across processes; pages stay in the worker.
+    _analyzer = ResumeAnalyzer(page_workers=1)
+    _file_timeout = file_timeout
+
+
+@contextmanager
+def _time_limit(seconds):
+    """Raise TimeoutError in the block after ``seconds`` of wall time (Unix only).
+
+    The analyzer's own timeout is only checked between pages, so a single
+    page that never finishes parsing would otherwise hold a worker forever.
+    """
+    if not seconds or not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TimeoutError(f"gave up after {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _extract(path):
+    with _time_limit(_file_timeout), open(path, "rb") as f:
+        return _analyzer.extract_text(f)
+
+
+def _error_records(path, error, roles):
+    return [{"file": path, "role": role, "error": error} for role in roles]
+
+
+def analyze_file(path, roles):
+    """Extract one file and score it for every role; errors become records too."""
+    try:
+        text = _extract(path)
+    except Exception as e:
+        return _error_records(path, f"{type(e).__name__}: {e}", roles)
+
+    records = []
+    for role in roles:
+        try:
+            results = _analyzer.analyze_text(text, role)
+        except Exception:
+            records.append({"file": path, "role": role, "error": traceback.format_exc(limit=3)})
+            continue
+
+        results.pop("resume_text")
+        results.pop("job_role")
+        records.append({"file": path, "role": role, "error": None, **results})
+    return records
+
+
+def extract_skills(path):
+    """Return ``(path, skills, error)``: every taxonomy skill found in one file."""
+    try:
+        text = _extract(path)
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+    return path, sorted(_analyzer.find_skills(text)), None
+
+
+def iter_file_results(func, paths, *args, workers=None, max_pending=None, on_error=None,
+                      file_timeout=FILE_TIMEOUT):
+    """Run ``func(path, *args)`` for every path in a process pool, yielding results as they finish.
+
+    At most ``max_pending`` files (default: twice the worker count) are
+    queued at once, so memory stays flat however many files there are.
+    Extracting one file may take at most ``file_timeout`` seconds.
+
+    If a worker process dies (a crash in a native parser, the OOM killer),
+    every file in flight yields ``on_error(path, error)`` instead, so a
+    resumed run does not crash on the same file again, and a new pool takes
+    over the remaining files. Without ``on_error`` the BrokenProcessPool is
+    raised.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    paths = iter(paths)
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(file_timeout,))
+
+    pool = new_pool()
+    pending = {}
+    try:
+        while True:
+            for path in paths:
+                pending[pool.submit(func, path, *args)] = path
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = any(isinstance(future.exception(), BrokenProcessPool) for future in done)
+            if broken:
+                # Every other file in flight fails with it; collect them all now.
+                done, _ = wait(pending)
+
+            for future in done:
+                path = pending.pop(future)
+                if isinstance(future.exception(), BrokenProcessPool) and on_error is not None:
+                    yield on_error(path, WORKER_DIED)
+                else:
+                    yield future.result()
+
+            if broken:
+                pool.shutdown()
+                pool = new_pool()
+    finally:
+        pool.shutdown()
+
+
+def iter_batch_results(paths, roles, workers=None, max_pending=None, file_timeout=FILE_TIMEOUT):
+    """Analyze ``paths`` for ``roles``, yielding each file's records as it finishes."""
+    return iter_file_results(
+        analyze_file, paths, roles, workers=workers, max_pending=max_pending, file_timeout=file_timeout,
+        on_error=lambda path, error: _error_records(path, error, roles)
+    )
+
+
+def _output_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _repair_tail(path):
+    """Cut off a partly written last record left by a crash."""
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+
+
+def completed_records(path, fmt=None):
+    """Return the (file, role) pairs already written to an output file."""
+    if not os.path.exists(path):
+        return set()
+
+    _repair_tail(path)
+    done = set()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if _output_format(path, fmt) == "csv":
+            for row in csv.DictReader(f):
+                done.add((row["file"], row["role"]))
+        else:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                done.add((record["file"], record["role"]))
+    return done
+
+
+def _csv_row(record):
+    row = {name: record.get(name) for name in CSV_FIELDS}
+    for name in ("matching_skills", "missing_skills"):
+        if row[name] is not None:
+            row[name] = "; ".join(row[name])
+    return row
+
+
+def run_batch(source, roles, output, fmt=None, workers=None, max_pending=None, file_timeout=FILE_TIMEOUT):
+    """Analyze every resume under ``source`` for ``roles`` and stream records to ``output``.
+
+    Files whose records are all in ``output`` already are skipped. Returns
+    counts of files processed, skipped and failed.
+    """
+    fmt = _output_format(output, fmt)
+    done = completed_records(output, fmt)
+    all_paths = list(iter_resume_files(source))
+    paths = [p for p in all_paths if any((p, role) not in done for role in roles)]
+
+    stats = {"files": 0, "skipped": len(all_paths) - len(paths), "failed": 0, "records": 0}
+    new_file = not os.path.exists(output) or os.path.getsize(output) == 0
+
+    with open(output, "a", encoding="utf-8", newline="") as f:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            if new_file:
+                writer.writeheader()
+
+        for records in iter_batch_results(paths, roles, workers, max_pending, file_timeout):
+            records = [r for r in records if (r["file"], r["role"]) not in done]
+            for record in records:
+                if writer is not None:
+                    writer.writerow(_csv_row(record))
+                else:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # One flush per file keeps a crash from losing more than the file in flight.
+            f.flush()
+
+            stats["files"] += 1
+            stats["records"] += len(records)
+            if any(r["error"] for r in records):
+                stats["failed"] += 1
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Directory of resumes or a manifest file listing them")
+    parser.add_argument("--role", action="append", required=True, help="Job role to score for (repeatable)")
+    parser.add_argument("-o", "--output", required=True, help="Output .jsonl or .csv file (appended to)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="Output format (default: from the output file extension)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--file-timeout", type=float, default=FILE_TIMEOUT,
+                        help=f"Seconds allowed to extract one file (default: {FILE_TIMEOUT}, 0: no limit)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = run_batch(args.source, args.role, args.output, args.format, args.workers,
+                      file_timeout=args.file_timeout)
+    elapsed = time.perf_counter() - start
+
+    print(f"{stats['files']} files ({stats['records']} records) in {elapsed:.1f}s, "
+          f"{stats['files'] / elapsed if elapsed else 0:.1f} files/s; "
+          f"{stats['skipped']} already done, {stats['failed']} with errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
 import os
-import json
-from groq import Groq
-import tiktoken
+import time
+import threading
+from itertools import islice
+
+import metrics
+from context_summary import ContextSummarizer
+from history_store import WriteBehindStore, open_history_store
+from resources import abortable, get_encoder, get_groq_client
+from response_cache import ResponseCache
+from retrieval_memory import TurnMemory
+from singleflight import Abandoned
 
 
 class ConversationManager:
@@ -13,7 +21,20 @@ class ConversationManager:
         default_max_tokens=5000,
         system_message="You are a helpful assistant.",
         token_budget=10000,
-        history_file="chat_history.json"
+        history_file="chat_history.jsonl",
+        history_store=None,
+        session_id=None,
+        durability="sync",
+        response_cache=None,
+        compaction="drop",
+        summary_model="llama-3.1-8b-instant",
+        compaction_target=0.5,
+        retrieval_k=3,
+        retrieval_tokens=1000,
+        scheduler=None,
+        router=None,
+        hedger=None,
+        single_flight=None
     ):
         if api_key is None:
             api_key = os.getenv("GROQ_API_KEY")
@@ -21,12 +42,36 @@ class ConversationManager:
         if not api_key:
             raise ValueError("GROQ_API_KEY not found. Please set it as environment variable.")
 
-        self.client = Groq(api_key=api_key)
+        self.client = self._create_client(api_key)
 
         self.default_model = default_model
         self.default_temperature = default_temperature
         self.default_max_tokens = default_max_tokens
         self.token_budget = token_budget
+        self.response_cache = response_cache
+        self.scheduler = scheduler
+        self.router = router
+        self.hedger = hedger
+        self.single_flight = single_flight
+        self.session_id = session_id or "default"
+
+        # "drop" discards the oldest turns when over budget; "summarize" trims
+        # down to compaction_target * token_budget and folds what it evicted
+        # into a rolling summary written in the background; "retrieve" trims
+        # the same way but indexes evicted turns locally and sends back the
+        # few most relevant to each prompt.
+        if compaction not in ("drop", "summarize", "retrieve"):
+            raise ValueError(f"Unknown compaction mode: {compaction}")
+        self.compaction = compaction
+        self.compaction_target = compaction_target
+        self.summarizer = None
+        if compaction == "summarize":
+            self.summarizer = ContextSummarizer(get_groq_client(api_key), summary_model)
+        self.memory = TurnMemory() if compaction == "retrieve" else None
+        self.retrieval_k = retrieval_k
+        self.retrieval_tokens = retrieval_tokens
+        self._evicted = []
+        self._summary_tokens = ("", 0)
 
         self.system_messages = {
             "helpful": "You are a helpful, polite assistant.",
@@ -37,70 +82,476 @@ class ConversationManager:
 
         self.current_persona = "helpful"
         self.history_file = history_file
-        self.encoder = tiktoken.get_encoding("cl100k_base")
+        # "sync" writes each change before returning; "turn" hands it to a
+        # background writer right away, which fsyncs every write; a number
+        # of milliseconds lets the writer batch changes for that long.
+        self.history_store = history_store or open_history_store(
+            history_file, session_id, fsync=True if durability == "turn" else None
+        )
+
+        if durability == "turn":
+            self.history_store = WriteBehindStore(self.history_store)
+        elif durability != "sync":
+            self.history_store = WriteBehindStore(self.history_store, durability / 1000)
+        self.encoder = get_encoder()
 
         self.load_conversation_history()
 
+    def _create_client(self, api_key):
+        return get_groq_client(api_key)
+
     def load_conversation_history(self):
-        try:
-            with open(self.history_file, "r", encoding="utf-8") as f:
-                self.conversation_history = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.conversation_history = [
+        history = self.history_store.load()
+        if not history:
+            history = [
                 {"role": "system", "content": self.system_messages[self.current_persona]}
             ]
+            self.history_store.reset(history)
+
+        self._set_history(history)
+        if self.memory is not None:
+            self._restore_memory()
+
+    def _restore_memory(self):
+        # Stores that archive trimmed messages (SQLite) let a new process
+        # re-index what fell out of the window before it started.
+        window = len(self.conversation_history) - 1
+        messages, _ = self.history_store.page(limit=self.memory.max_turns * 2 + window)
+        older = messages[:len(messages) - window]
+        self.memory.clear()
+        self.memory.add(older, [self.count_tokens(m.get("content") or "") for m in older])
+
+    def _set_history(self, messages):
+        # Token counts are kept alongside the history so budget checks never
+        # have to re-encode messages that were already counted once.
+        self.conversation_history = list(messages)
+        self._token_counts = [self.count_tokens(m.get("content") or "") for m in self.conversation_history]
+        self._total_tokens = sum(self._token_counts)
+
+    def _append_message(self, role, content):
+        message = {"role": role, "content": content}
+        tokens = self.count_tokens(content or "")
+
+        self.conversation_history.append(message)
+        self._token_counts.append(tokens)
+        self._total_tokens += tokens
+        return message
+
+    def _replace_message(self, index, message):
+        tokens = self.count_tokens(message.get("content") or "")
+
+        self._total_tokens += tokens - self._token_counts[index]
+        self.conversation_history[index] = message
+        self._token_counts[index] = tokens
 
     def save_conversation_history(self):
-        with open(self.history_file, "w", encoding="utf-8") as f:
-            json.dump(self.conversation_history, f, indent=2)
+        # Writes a full snapshot; the chat path only persists what changed.
+        self.history_store.reset(self.conversation_history)
 
-    def clear_history(self):
-        self.conversation_history = [
+    def export_history(self, path):
+        self.history_store.export_json(path)
+
+    def history_page(self, before=None, limit=20):
+        """One page of the stored transcript for display; see HistoryStore.page()."""
+        return self.history_store.page(before, limit)
+
+    def close(self):
+        if self.summarizer is not None:
+            self.summarizer.close()
+        self.history_store.close()
+
+    def _reset_history(self):
+        self._set_history([
             {"role": "system", "content": self.system_messages[self.current_persona]}
-        ]
-        self.save_conversation_history()
+        ])
+        if self.summarizer is not None:
+            self.summarizer.reset()
+        if self.memory is not None:
+            self.memory.clear()
+
+    def clear_history(self):
+        self._reset_history()
+        self.history_store.reset(self.conversation_history)
 
     def count_tokens(self, text):
-        return len(self.encoder.encode(text))
+        with metrics.timer("chat_tokenize_seconds"):
+            return len(self.encoder.encode(text))
 
     def total_tokens_used(self):
-        return sum(self.count_tokens(m["content"]) for m in self.conversation_history)
+        return self._total_tokens
+
+    def _summary_message(self):
+        if self.summarizer is None:
+            return None
+        return self.summarizer.message()
 
+    def _summary_token_count(self, summary_message):
+        if summary_message is None:
+            return 0
+
+        # The summary only changes when the background pass finishes, so
+        # remember its count instead of re-encoding it on every request.
+        content = summary_message["content"]
+        if self._summary_tokens[0] != content:
+            self._summary_tokens = (content, self.count_tokens(content))
+        return self._summary_tokens[1]
+
+    @metrics.timed("chat_budget_trim_seconds")
     def enforce_token_budget(self):
-        while self.total_tokens_used() > self.token_budget and len(self.conversation_history) > 1:
-            self.conversation_history.pop(1)
+        reserved = self._summary_token_count(self._summary_message())
+        if self.memory is not None:
+            # Room for the recalled turns _recall_message() may add to the prompt.
+            reserved += self.retrieval_tokens
+        excess = self._total_tokens + reserved - self.token_budget
+        if excess <= 0:
+            return 0
 
-    def set_persona(self, persona_name):
+        if self.compaction != "drop":
+            excess += int(self.token_budget * (1 - self.compaction_target))
+
+        # Find how many of the oldest non-system messages have to go, then
+        # drop them with a single slice delete.
+        drop = 0
+        freed = 0
+        for tokens in islice(self._token_counts, 1, None):
+            if freed >= excess:
+                break
+            freed += tokens
+            drop += 1
+
+        if self.summarizer is not None:
+            self._evicted.extend(self.conversation_history[1:1 + drop])
+
+        if self.memory is not None:
+            # Evict whole exchanges so a remembered question keeps its answer.
+            history = self.conversation_history
+            while 1 + drop < len(history) and history[1 + drop]["role"] == "assistant":
+                freed += self._token_counts[1 + drop]
+                drop += 1
+            self.memory.add(history[1:1 + drop], self._token_counts[1:1 + drop])
+
+        del self.conversation_history[1:1 + drop]
+        del self._token_counts[1:1 + drop]
+        self._total_tokens -= freed
+        metrics.inc("chat_trimmed_messages_total", drop)
+        return drop
+
+    def _persona_message(self, persona_name):
         if persona_name not in self.system_messages:
-            return
+            return None
 
         self.current_persona = persona_name
-        self.conversation_history[0] = {
+        message = {
             "role": "system",
             "content": self.system_messages[persona_name]
         }
-        self.save_conversation_history()
+        self._replace_message(0, message)
+        return message
 
-    def chat_completion(self, user_prompt):
-        self.conversation_history.append(
-            {"role": "user", "content": user_prompt}
+    def set_persona(self, persona_name):
+        message = self._persona_message(persona_name)
+        if message is not None:
+            self.history_store.set_message(0, message)
+
+    def _start_turn(self, user_prompt):
+        checkpoint = (
+            list(self.conversation_history),
+            list(self._token_counts),
+            self._total_tokens,
+            self.memory.mark() if self.memory is not None else None
         )
 
-        self.enforce_token_budget()
+        user_message = self._append_message("user", user_prompt)
+        dropped = self.enforce_token_budget()
+        return checkpoint, user_message, dropped
+
+    def _rollback_turn(self, checkpoint):
+        self.conversation_history, self._token_counts, self._total_tokens, memory_mark = checkpoint
+        self._evicted = []
+        if memory_mark is not None:
+            self.memory.truncate(memory_mark)
+
+    def _record_reply(self, user_message, dropped, assistant_reply):
+        assistant_message = self._append_message("assistant", assistant_reply)
+
+        if self._evicted:
+            self.summarizer.submit(self._evicted)
+            self._evicted = []
+
+        return [
+            ("append", user_message),
+            ("trim", dropped),
+            ("append", assistant_message)
+        ]
+
+    def _finish_turn(self, user_message, dropped, assistant_reply):
+        ops = self._record_reply(user_message, dropped, assistant_reply)
+        with metrics.timer("chat_history_save_seconds"):
+            self.history_store.apply(ops)
+
+    def _record_generation(self, elapsed, ttft=None):
+        # Called after the reply was appended, so its token count is the last one.
+        if not metrics.REGISTRY.enabled:
+            return
+
+        metrics.observe("chat_groq_request_seconds", elapsed)
+        if ttft is not None:
+            metrics.observe("chat_ttft_seconds", ttft)
+        generation_time = elapsed - (ttft or 0)
+        if generation_time > 0:
+            metrics.observe("chat_tokens_per_second", self._token_counts[-1] / generation_time,
+                            buckets=metrics.RATE_BUCKETS)
 
-        response = self.client.chat.completions.create(
-            model=self.default_model,
-            messages=self.conversation_history,
-            temperature=self.default_temperature,
-            max_tokens=self.default_max_tokens
+    def _recall_message(self):
+        if self.memory is None or not len(self.memory):
+            return None
+
+        last = self.conversation_history[-1]
+        if last["role"] != "user":
+            return None
+
+        turns = self.memory.search(last["content"], self.retrieval_k, self.retrieval_tokens)
+        if not turns:
+            return None
+
+        excerpts = "\n\n".join(
+            "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in turn) for turn in turns
         )
+        return {"role": "system", "content": f"Relevant earlier turns of this conversation:\n{excerpts}"}
+
+    def _request_params(self):
+        messages = self.conversation_history
+        context = [m for m in (self._summary_message(), self._recall_message()) if m is not None]
+        if context:
+            messages = [messages[0]] + context + messages[1:]
+
+        return {
+            "model": self.default_model,
+            "messages": messages,
+            "temperature": self.default_temperature,
+            "max_tokens": self.default_max_tokens
+        }
 
-        assistant_reply = response.choices[0].message.content
+    def _estimated_tokens(self, params):
+        # Everything the request counts against the TPM limit: the history,
+        # the summary and recalled turns placed after the system prompt, and
+        # the most the reply may use.
+        tokens = self._total_tokens + (params.get("max_tokens") or 0)
+        summary = self._summary_message()
+        for message in params["messages"][1:]:
+            if message["role"] != "system":
+                break
+            if summary is not None and message["content"] == summary["content"]:
+                tokens += self._summary_token_count(summary)
+            else:
+                tokens += self.count_tokens(message["content"])
+        return tokens
 
-        self.conversation_history.append(
-            {"role": "assistant", "content": assistant_reply}
+    def _cache_lookup(self, params):
+        if self.response_cache is None:
+            return None, None
+
+        cache_key = self.response_cache.make_key(params)
+        return cache_key, self.response_cache.get(cache_key)
+
+    def _cache_store(self, cache_key, assistant_reply):
+        if cache_key is not None:
+            self.response_cache.set(cache_key, assistant_reply)
+
+    def _dispatch(self, params):
+        if self.scheduler is None:
+            return self.client.chat.completions.create(**params)
+
+        return self.scheduler.create(
+            self.client, params, session_id=self.session_id, estimated_tokens=self._estimated_tokens(params)
         )
 
-        self.save_conversation_history()
+    def _create(self, params):
+        if self.router is None:
+            return self._dispatch(params)
+
+        return self.router.call(
+            lambda model: self._dispatch({**params, "model": model}),
+            self._total_tokens,
+            self.current_persona,
+            stream=params.get("stream", False)
+        )
+
+    def _iter_stream(self, stream, cancel=None):
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    return
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            stream.close()
+
+    def _send_attempt(self, params, model, cancel, hedge):
+        # Hedged attempts stream so that the losing one can be abandoned
+        # mid-generation. Only the duplicate runs abortable, so that it can
+        # also be cut off while still waiting for its first byte: that needs
+        # a connection of its own, and the primary, which is most requests,
+        # keeps reusing pooled ones.
+        if not hedge:
+            return "".join(self._iter_stream(self._create({**params, "stream": True}), cancel))
+
+        with abortable() as scope:
+            cancel.add_callback(scope.abort)
+            if model is None:
+                stream = self._create({**params, "stream": True})
+            else:
+                stream = self._dispatch({**params, "model": model, "stream": True})
+            return "".join(self._iter_stream(stream, cancel))
+
+    def _send(self, params):
+        if self.hedger is not None:
+            return self.hedger.call(
+                lambda model, cancel, hedge: self._send_attempt(params, model, cancel, hedge)
+            )
+
+        response = self._create(params)
+        return response.choices[0].message.content
+
+    def _send_stream(self, params):
+        return self._iter_stream(self._create({**params, "stream": True}))
+
+    def _flight_key(self, params, cache_key):
+        # Identical prompts share a key across sessions, exactly like the cache.
+        return cache_key or ResponseCache.make_key(params)
+
+    def _send_shared(self, params, cache_key):
+        if self.single_flight is None:
+            return self._send(params)
+
+        return self.single_flight.do(self._flight_key(params, cache_key), lambda: self._send(params))
+
+    def _send_stream_shared(self, params, cache_key):
+        if self.single_flight is None:
+            yield from self._send_stream(params)
+            return
+
+        key = self._flight_key(params, cache_key)
+        call, leader = self.single_flight.begin(key)
+        if not leader:
+            sent = False
+            try:
+                for delta in call.follow():
+                    sent = True
+                    yield delta
+            except Abandoned:
+                if sent:
+                    raise
+                self.single_flight.leave(call)
+                call = None
+                yield from self._send_stream(params)
+            finally:
+                if call is not None:
+                    self.single_flight.leave(call)
+            return
+
+        deltas = self._send_stream(params)
+        parts = []
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                call.publish(delta)
+                yield delta
+        except GeneratorExit:
+            if not self.single_flight.abandon(key, call):
+                # Other sessions are still reading this reply; finish it for them.
+                threading.Thread(
+                    target=self._relay_stream, args=(key, call, deltas, parts), daemon=True
+                ).start()
+            else:
+                deltas.close()
+            raise
+        except Exception as e:
+            self.single_flight.finish(key, call, error=e)
+            raise
+        self.single_flight.finish(key, call, "".join(parts))
+
+    def _relay_stream(self, key, call, deltas, parts):
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                call.publish(delta)
+                if self.single_flight.abandon(key, call):
+                    # Every follower has stopped reading too.
+                    deltas.close()
+                    return
+        except Exception as e:
+            self.single_flight.finish(key, call, error=e)
+            return
+        self.single_flight.finish(key, call, "".join(parts))
+
+    def chat_completion(self, user_prompt):
+        metrics.inc("chat_requests_total")
+        checkpoint, user_message, dropped = self._start_turn(user_prompt)
+        params = self._request_params()
+        elapsed = None
+
+        try:
+            cache_key, assistant_reply = self._cache_lookup(params)
+            if assistant_reply is None:
+                started = time.perf_counter()
+                assistant_reply = self._send_shared(params, cache_key)
+                elapsed = time.perf_counter() - started
+                self._cache_store(cache_key, assistant_reply)
+            else:
+                metrics.inc("chat_cache_hits_total")
+        except Exception:
+            metrics.inc("chat_errors_total")
+            self._rollback_turn(checkpoint)
+            raise
+
+        self._finish_turn(user_message, dropped, assistant_reply)
+        if elapsed is not None:
+            self._record_generation(elapsed)
+
+        return assistant_reply
+
+    def chat_completion_stream(self, user_prompt):
+        """Yield the reply text piece by piece as the model generates it.
+
+        History is only committed once the stream completes. If the stream
+        fails, or the caller stops iterating early, the turn is rolled back
+        and nothing is persisted.
+        """
+        metrics.inc("chat_requests_total")
+        checkpoint, user_message, dropped = self._start_turn(user_prompt)
+        params = self._request_params()
+        parts = []
+        completed = False
+        elapsed = ttft = None
+
+        try:
+            cache_key, cached_reply = self._cache_lookup(params)
+            if cached_reply is not None:
+                metrics.inc("chat_cache_hits_total")
+                parts.append(cached_reply)
+                yield cached_reply
+            else:
+                started = time.perf_counter()
+                for delta in self._send_stream_shared(params, cache_key):
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    parts.append(delta)
+                    yield delta
+                elapsed = time.perf_counter() - started
+                self._cache_store(cache_key, "".join(parts))
 
-        return assistant_reply
\ No newline at end of file
+            completed = True
+        except Exception:
+            metrics.inc("chat_errors_total")
+            raise
+        finally:
+            if completed:
+                self._finish_turn(user_message, dropped, "".join(parts))
+                if elapsed is not None:
+                    self._record_generation(elapsed, ttft)
+            else:
+                self._rollback_turn(checkpoint)
@@ -0,0 +1,105 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContextSummarizer:
+    """Folds evicted conversation turns into a rolling summary.
+
+    Turns handed to ``submit()`` are summarized on a background thread by a
+    (cheaper) model, so the chat request path never waits for it. Batches
+    that arrive while a summary is being written are folded in on the next
+    pass.
+    """
+
+    INSTRUCTIONS = (
+        "You maintain a running summary of a conversation between a user and an assistant. "
+        "Merge the new turns into the current summary. Keep facts, decisions, names, code "
+        "identifiers and open questions; drop small talk. Reply with the summary only."
+    )
+
+    def __init__(self, client, model="llama-3.1-8b-instant", max_tokens=300):
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+
+        self.summary = ""
+        self._pending = []
+        self._running = False
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-summary")
+
+    def submit(self, messages):
+        if not messages:
+            return
+
+        with self._lock:
+            self._pending.extend(messages)
+            if self._running:
+                return
+            self._running = True
+            self._idle.clear()
+
+        self._executor.submit(self._run)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                previous = self.summary
+                generation = self._generation
+                if not batch:
+                    self._running = False
+                    self._idle.set()
+                    return
+
+            try:
+                summary = self._summarize(previous, batch)
+            except Exception:
+                logger.exception("Summarizing %d evicted messages failed", len(batch))
+                continue
+
+            with self._lock:
+                # A reset() while we were waiting on the model discards this pass.
+                if generation == self._generation:
+                    self.summary = summary
+
+    def _summarize(self, previous, batch):
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in batch)
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": self.INSTRUCTIONS},
+                {"role": "user", "content": f"Current summary:\n{previous or '(empty)'}\n\nNew turns:\n{transcript}"}
+            ],
+            temperature=0.2,
+            max_tokens=self.max_tokens
+        )
+        return response.choices[0].message.content.strip()
+
+    def message(self):
+        """Return the summary as a system message, or None if there is none yet."""
+        with self._lock:
+            summary = self.summary
+        if not summary:
+            return None
+        return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+    def wait(self, timeout=None):
+        """Block until all submitted turns have been folded in."""
+        return self._idle.wait(timeout)
+
+    def reset(self):
+        with self._lock:
+            self.summary = ""
+            self._pending = []
+            self._generation += 1
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,165 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class CancelEvent(threading.Event):
+    """threading.Event that also runs callbacks when it is set."""
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """Run ``callback()`` when the event is set, or right away if it already is."""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class Hedger:
+    """Opt-in request hedging to cut tail latency.
+
+    The primary request is sent right away. If it has not answered after the
+    ``percentile`` of recently observed latencies (clamped to
+    ``[min_delay, max_delay]``), a duplicate is sent, to ``hedge_model`` if
+    one is set. The first successful answer wins and the other request is
+    cancelled. Hedges are capped at ``max_extra_fraction`` of all requests so
+    extra spend stays bounded.
+
+    ``attempt(model, cancel, hedge)`` performs one request: ``model`` is
+    None for the primary and ``hedge_model`` for the duplicate, ``hedge``
+    tells the two apart, and ``cancel`` is a CancelEvent set when the other
+    attempt wins. The attempt polls it while streaming; the duplicate may
+    also register a callback to abort a request that is still waiting for
+    its first byte.
+    """
+
+    def __init__(self, percentile=0.95, min_delay=0.1, max_delay=5.0, max_extra_fraction=0.1,
+                 hedge_model=None, window=500, max_workers=64):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.max_extra_fraction = max_extra_fraction
+        self.hedge_model = hedge_model
+
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def delay(self):
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return self.max_delay
+
+        index = min(int(self.percentile * len(samples)), len(samples) - 1)
+        return min(max(samples[index], self.min_delay), self.max_delay)
+
+    def _start(self):
+        """Count a request; return True if a hedge would stay within the spend cap."""
+        with self._lock:
+            self.requests += 1
+            return self.hedges + 1 <= self.max_extra_fraction * self.requests
+
+    def _hedged(self):
+        with self._lock:
+            self.hedges += 1
+
+    def _finish(self, started, hedge_won):
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def call(self, attempt):
+        may_hedge = self._start()
+        started = time.perf_counter()
+        cancel_primary = CancelEvent()
+        primary = self._executor.submit(attempt, None, cancel_primary, False)
+
+        try:
+            result = primary.result(timeout=self.delay() if may_hedge else None)
+        except FutureTimeoutError:
+            pass
+        else:
+            self._finish(started, False)
+            return result
+
+        self._hedged()
+        cancel_hedge = CancelEvent()
+        hedge = self._executor.submit(attempt, self.hedge_model, cancel_hedge, True)
+        cancels = {primary: cancel_primary, hedge: cancel_hedge}
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        cancels[other].set()
+                    self._finish(started, future is hedge)
+                    return future.result()
+
+        # Both attempts failed; surface the primary's error.
+        return primary.result()
+
+    async def acall(self, attempt):
+        """Async counterpart of call(); ``attempt(model)`` is a coroutine
+        function and the losing request is cancelled as a task."""
+        may_hedge = self._start()
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(attempt(None))
+        hedge = None
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.delay() if may_hedge else None)
+            if primary in done:
+                result = primary.result()
+                self._finish(started, False)
+                return result
+
+            self._hedged()
+            hedge = asyncio.ensure_future(attempt(self.hedge_model))
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._finish(started, task is hedge)
+                        return task.result()
+
+            # Both attempts failed; surface the primary's error.
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self):
+        delay = self.delay()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "delay": delay
+            }
@@ -0,0 +1,677 @@
+import os
+import json
+import time
+import atexit
+import logging
+import sqlite3
+import threading
+import weakref
+
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_json(path, data, indent=None):
+    """Write JSON to a temp file, fsync it and rename it over ``path``."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def apply_history_op(messages, op):
+    """Apply one history operation to a list of messages in place.
+
+    Operations are tuples:
+        ("append", message)
+        ("trim", count)            - drop ``count`` messages after the system message
+        ("set", index, message)
+        ("reset", messages)
+    """
+    kind = op[0]
+
+    if kind == "append":
+        messages.append(dict(op[1]))
+    elif kind == "trim":
+        del messages[1:1 + op[1]]
+    elif kind == "set":
+        messages[op[1]] = dict(op[2])
+    elif kind == "reset":
+        messages[:] = [dict(m) for m in op[1]]
+    else:
+        raise ValueError(f"Unknown history operation: {kind}")
+
+
+class HistoryStore:
+    """Base class for conversation history backends.
+
+    Every change is expressed as a list of operations (see ``apply_history_op``)
+    so that a backend can persist only what changed instead of the whole
+    conversation.
+    """
+
+    def __init__(self):
+        self._messages = []
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Return the stored messages, or None if nothing has been stored yet."""
+        raise NotImplementedError
+
+    def _write(self, ops):
+        raise NotImplementedError
+
+    def apply(self, ops):
+        ops = [op for op in ops if not (op[0] == "trim" and op[1] <= 0)]
+        if not ops:
+            return
+
+        with self._lock:
+            for op in ops:
+                apply_history_op(self._messages, op)
+            self._write(ops)
+
+    def append(self, *messages):
+        self.apply([("append", m) for m in messages])
+
+    def trim(self, count):
+        self.apply([("trim", count)])
+
+    def set_message(self, index, message):
+        self.apply([("set", index, message)])
+
+    def reset(self, messages):
+        self.apply([("reset", messages)])
+
+    def messages(self):
+        with self._lock:
+            return [dict(m) for m in self._messages]
+
+    def page(self, before=None, limit=50):
+        """Return ``(messages, cursor)``: up to ``limit`` messages older than ``before``.
+
+        The system message is left out and messages come oldest first. Pass
+        the returned cursor back as ``before`` to fetch the next older page;
+        it is None once there is nothing older.
+        """
+        with self._lock:
+            end = len(self._messages) - 1 if before is None else before
+            start = max(end - limit, 0)
+            return [dict(m) for m in self._messages[1 + start:1 + end]], start or None
+
+    def export_json(self, path):
+        """Export the conversation in the whole-file ``chat_history.json`` format."""
+        atomic_write_json(path, self.messages(), indent=2)
+
+    def close(self):
+        pass
+
+
+class JSONFileStore(HistoryStore):
+    """Stores the whole conversation as one JSON list, rewritten on every change."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError as e:
+            corrupt_path = self.path + ".corrupt"
+            os.replace(self.path, corrupt_path)
+            logger.error("History file %s is corrupt (%s); moved it to %s", self.path, e, corrupt_path)
+            return None
+
+        with self._lock:
+            self._messages = messages
+        return self.messages()
+
+    def _write(self, ops):
+        atomic_write_json(self.path, self._messages, indent=2)
+
+
+class JournalStore(HistoryStore):
+    """Append-only JSONL journal with periodic snapshots.
+
+    Each change is appended to the journal as one line tagged with a sequence
+    number. Once the journal grows past ``compact_bytes`` it is rotated and a
+    snapshot of the full conversation is written in a background thread; the
+    snapshot records the last sequence number it covers so replay can skip
+    journal entries that are already folded in.
+
+    If nothing has been journaled yet and ``legacy_path`` names a whole-file
+    JSON history (the old ``chat_history.json``), it is imported on load.
+    The legacy file itself is left in place.
+    """
+
+    def __init__(self, path, compact_bytes=1024 * 1024, fsync=True, legacy_path=None):
+        super().__init__()
+        self.path = path
+        self.legacy_path = legacy_path
+        self.snapshot_path = path + ".snapshot"
+        self.compacting_path = path + ".compacting"
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+
+        self._seq = 0
+        self._journal = None
+        self._compaction_thread = None
+
+    def load(self):
+        with self._lock:
+            found = False
+            messages = []
+            snapshot_seq = 0
+
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                messages = snapshot["messages"]
+                snapshot_seq = snapshot["seq"]
+                found = True
+            except FileNotFoundError:
+                pass
+            except (json.JSONDecodeError, KeyError) as e:
+                logger.error("History snapshot %s is unreadable (%s); replaying journal only",
+                             self.snapshot_path, e)
+
+            self._seq = snapshot_seq
+            for path in (self.compacting_path, self.path):
+                if os.path.exists(path):
+                    found = True
+                    self._replay(path, messages, snapshot_seq)
+
+            self._messages = messages
+
+            # A leftover rotated journal means a compaction was interrupted;
+            # finish it now so the next rotation cannot clobber it.
+            if os.path.exists(self.compacting_path):
+                self._close_journal()
+                atomic_write_json(self.snapshot_path, {"seq": self._seq, "messages": self._messages})
+                self._truncate_journal()
+                os.remove(self.compacting_path)
+
+            if not found and self.legacy_path is not None:
+                found = self._import_legacy()
+
+        return self.messages() if found else None
+
+    def _import_legacy(self):
+        legacy = JSONFileStore(self.legacy_path)
+        messages = legacy.load()
+        if not messages:
+            return False
+
+        self.apply([("reset", messages)])
+        logger.info("Imported %d messages from %s into %s", len(messages), self.legacy_path, self.path)
+        return True
+
+    def _replay(self, path, messages, snapshot_seq):
+        good_offset = 0
+        raw_line = b"\n"
+        with open(path, "rb") as f:
+            for raw_line in f:
+                try:
+                    entry = json.loads(raw_line)
+                    op = self._decode(entry)
+                except (ValueError, KeyError, IndexError) as e:
+                    if raw_line.endswith(b"\n"):
+                        logger.error("Skipping corrupt entry in %s: %s", path, e)
+                        good_offset += len(raw_line)
+                        continue
+                    # A torn final line is what an interrupted append leaves
+                    # behind; cut it off so the next append starts cleanly.
+                    logger.warning("Discarding incomplete final entry in %s", path)
+                    break
+
+                good_offset += len(raw_line)
+                if entry["seq"] <= snapshot_seq:
+                    continue
+                apply_history_op(messages, op)
+                self._seq = max(self._seq, entry["seq"])
+
+        if good_offset < os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+        elif not raw_line.endswith(b"\n"):
+            with open(path, "ab") as f:
+                f.write(b"\n")
+
+    @staticmethod
+    def _encode(seq, op):
+        kind = op[0]
+        if kind == "append":
+            return {"seq": seq, "op": kind, "message": op[1]}
+        if kind == "trim":
+            return {"seq": seq, "op": kind, "count": op[1]}
+        if kind == "set":
+            return {"seq": seq, "op": kind, "index": op[1], "message": op[2]}
+        return {"seq": seq, "op": kind, "messages": op[1]}
+
+    @staticmethod
+    def _decode(entry):
+        kind = entry["op"]
+        if kind == "append":
+            return ("append", entry["message"])
+        if kind == "trim":
+            return ("trim", entry["count"])
+        if kind == "set":
+            return ("set", entry["index"], entry["message"])
+        if kind == "reset":
+            return ("reset", entry["messages"])
+        raise ValueError(f"Unknown journal operation: {kind}")
+
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.path, "a", encoding="utf-8")
+        return self._journal
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _truncate_journal(self):
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+
+    def _write(self, ops):
+        lines = []
+        for op in ops:
+            self._seq += 1
+            lines.append(json.dumps(self._encode(self._seq, op)) + "\n")
+
+        journal = self._open_journal()
+        journal.write("".join(lines))
+        journal.flush()
+        if self.fsync:
+            os.fsync(journal.fileno())
+
+        if journal.tell() > self.compact_bytes:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        if os.path.exists(self.compacting_path):
+            # An earlier snapshot failed; keep its rotated journal until load() recovers it.
+            return
+
+        self._close_journal()
+        os.replace(self.path, self.compacting_path)
+        snapshot = {"seq": self._seq, "messages": [dict(m) for m in self._messages]}
+
+        self._compaction_thread = threading.Thread(
+            target=self._compact, args=(snapshot,), name="history-compaction", daemon=True
+        )
+        self._compaction_thread.start()
+
+    def _compact(self, snapshot):
+        try:
+            atomic_write_json(self.snapshot_path, snapshot)
+            os.remove(self.compacting_path)
+        except OSError:
+            logger.exception("History compaction of %s failed", self.path)
+
+    def compact(self):
+        """Force a compaction and wait for it to finish."""
+        with self._lock:
+            if self._compaction_thread is not None:
+                self._compaction_thread.join()
+            self._start_compaction()
+            thread = self._compaction_thread
+        thread.join()
+
+    def close(self):
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self._close_journal()
+
+
+class SQLiteStore(HistoryStore):
+    """Per-session history in a shared SQLite database.
+
+    The database runs in WAL mode so many sessions can read and write
+    concurrently, each touching only its own rows. Trimming moves the
+    session's window forward instead of deleting rows, and ``load()`` only
+    reads the most recent ``max_messages`` messages of that window; older
+    messages are read on demand through ``page()``.
+
+    Commits run with ``synchronous=NORMAL``: they survive the process
+    crashing but not the machine losing power, which can undo the last few.
+    ``fsync=True`` switches to ``synchronous=FULL``, one fsync per commit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            system_message TEXT NOT NULL,
+            window_start INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+    """
+
+    def __init__(self, path, session_id, max_messages=200, fsync=False):
+        super().__init__()
+        self.path = path
+        self.session_id = session_id
+        self.max_messages = max_messages
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL" if fsync else "PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+        # Row ids of the loaded non-system messages, parallel to _messages[1:].
+        self._ids = []
+
+    @classmethod
+    def purge_sessions(cls, path, max_age):
+        """Delete every session not written to for ``max_age`` seconds; returns how many."""
+        cutoff = time.time() - max_age
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.executescript(cls.SCHEMA)
+            with conn:
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id IN "
+                    "(SELECT session_id FROM sessions WHERE updated_at < ?)",
+                    (cutoff,)
+                )
+                return conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+        finally:
+            conn.close()
+
+    def load(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT system_message, window_start FROM sessions WHERE session_id = ?",
+                (self.session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            system_message, window_start = row
+            rows = self._conn.execute(
+                "SELECT id, role, content FROM messages "
+                "WHERE session_id = ? AND id >= ? ORDER BY id DESC LIMIT ?",
+                (self.session_id, window_start, self.max_messages)
+            ).fetchall()
+            rows.reverse()
+
+            self._ids = [r[0] for r in rows]
+            self._messages = [json.loads(system_message)]
+            self._messages.extend({"role": r[1], "content": r[2]} for r in rows)
+
+        return self.messages()
+
+    def apply(self, ops):
+        ops = [op for op in ops if not (op[0] == "trim" and op[1] <= 0)]
+        if not ops:
+            return
+
+        with self._lock, self._conn:
+            for op in ops:
+                self._apply_sql(op)
+                apply_history_op(self._messages, op)
+
+            self._conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE session_id = ?",
+                (time.time(), self.session_id)
+            )
+
+    def _insert(self, message):
+        cursor = self._conn.execute(
+            "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (self.session_id, message["role"], message["content"], time.time())
+        )
+        self._ids.append(cursor.lastrowid)
+
+    def _apply_sql(self, op):
+        kind = op[0]
+
+        if kind == "append":
+            self._insert(op[1])
+        elif kind == "trim":
+            trimmed = self._ids[:op[1]]
+            del self._ids[:op[1]]
+            if trimmed:
+                self._conn.execute(
+                    "UPDATE sessions SET window_start = ? WHERE session_id = ?",
+                    (trimmed[-1] + 1, self.session_id)
+                )
+        elif kind == "set":
+            index, message = op[1], op[2]
+            if index == 0:
+                self._conn.execute(
+                    "UPDATE sessions SET system_message = ? WHERE session_id = ?",
+                    (json.dumps(message), self.session_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE messages SET role = ?, content = ? WHERE id = ?",
+                    (message["role"], message["content"], self._ids[index - 1])
+                )
+        elif kind == "reset":
+            messages = op[1]
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (self.session_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, system_message, window_start, updated_at) "
+                "VALUES (?, ?, 0, ?)",
+                (self.session_id, json.dumps(messages[0]), time.time())
+            )
+            self._ids = []
+            for message in messages[1:]:
+                self._insert(message)
+        else:
+            raise ValueError(f"Unknown history operation: {kind}")
+
+    def page(self, before=None, limit=50):
+        # Reads below window_start as well, so trimmed turns stay browsable.
+        query = "SELECT id, role, content FROM messages WHERE session_id = ?"
+        args = [self.session_id]
+        if before is not None:
+            query += " AND id < ?"
+            args.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        args.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+
+        cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            cursor = rows[-1][0]
+        rows.reverse()
+        return [{"role": r[1], "content": r[2]} for r in rows], cursor
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Writer:
+    """The one background thread that writes for every WriteBehindStore.
+
+    Stores with queued changes are kept in ``_due`` until their write time;
+    idle stores are not referenced at all, so a session that is dropped
+    without ``close()`` costs no thread and can be garbage collected.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._due = {}
+        self._thread = None
+
+    def schedule(self, store, delay):
+        """Write ``store``'s queue within ``delay`` seconds."""
+        due = time.monotonic() + delay
+        with self._cond:
+            if due < self._due.get(store, float("inf")):
+                self._due[store] = due
+                self._cond.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="history-write-behind", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    store = min(self._due, key=self._due.get, default=None)
+                    if store is not None and self._due[store] <= now:
+                        del self._due[store]
+                        break
+                    self._cond.wait(None if store is None else self._due[store] - now)
+            store._drain()
+
+
+_writer = _Writer()
+
+
+class WriteBehindStore(HistoryStore):
+    """Persists another store's changes from a background thread.
+
+    ``apply()`` updates the in-memory conversation and returns at once; the
+    operations are queued and handed to the wrapped store in batches, so a
+    burst of changes costs one journal fsync, one SQLite transaction or one
+    rewrite of a JSON file. A ``reset`` discards whatever was queued before
+    it. One writer thread serves every store in the process.
+
+    ``flush_interval`` is the durability knob: 0 writes every change as soon
+    as it is queued, a positive value (seconds) gathers changes for that long
+    first. ``flush()`` blocks until everything queued is on disk; it runs on
+    ``close()`` and for every open store at interpreter exit.
+    """
+
+    PAGE_WAIT = 0.05
+
+    def __init__(self, store, flush_interval=0.0):
+        super().__init__()
+        self.store = store
+        self.flush_interval = flush_interval
+
+        self._pending = []
+        self._writing = False
+        self._closed = False
+        self._cond = threading.Condition(self._lock)
+        _write_behind_stores.add(self)
+
+    def load(self):
+        messages = self.store.load()
+        with self._lock:
+            self._messages = messages or []
+        return messages
+
+    def _write(self, ops):
+        for index in range(len(ops) - 1, -1, -1):
+            if ops[index][0] == "reset":
+                self._pending = []
+                ops = ops[index:]
+                break
+        if not self._pending:
+            _writer.schedule(self, self.flush_interval)
+        self._pending.extend(ops)
+
+    def _drain(self):
+        # Runs on the writer thread.
+        with self._cond:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            self._writing = True
+
+        failed = False
+        try:
+            self.store.apply(batch)
+        except Exception:
+            logger.exception("Writing %d history operations failed; will retry", len(batch))
+            failed = True
+
+        with self._cond:
+            self._writing = False
+            if failed:
+                if self._pending:
+                    self._pending[:0] = batch
+                else:
+                    self._pending = batch
+                    _writer.schedule(self, max(self.flush_interval, 1.0))
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued change has been written; False on timeout."""
+        with self._cond:
+            if not self._pending and not self._writing:
+                return True
+        _writer.schedule(self, 0)
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def page(self, before=None, limit=50):
+        """Like HistoryStore.page(), read from the wrapped store once queued writes land.
+
+        The newest page never waits on a slow writer: if the queue has not
+        drained within ``PAGE_WAIT`` seconds it is served from the in-memory
+        conversation instead, with no cursor, and turns the wrapped store
+        keeps outside that window reappear once the writer catches up.
+        """
+        if before is not None:
+            self.flush(timeout=5)
+        elif not self.flush(timeout=self.PAGE_WAIT):
+            messages, _ = super().page(None, limit)
+            return messages, None
+        return self.store.page(before, limit)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            if not self.flush(timeout=30):
+                with self._cond:
+                    logger.error("Dropping %d unwritten history operations on close", len(self._pending))
+                    self._pending = []
+                    self._cond.wait_for(lambda: not self._writing)
+            _write_behind_stores.discard(self)
+        self.store.close()
+
+
+_write_behind_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_write_behind_stores():
+    for store in list(_write_behind_stores):
+        store.flush(timeout=30)
+
+
+def open_history_store(path, session_id=None, fsync=None):
+    """Pick a backend from the file extension.
+
+    ``.db``/``.sqlite`` files are per-session SQLite stores, ``.jsonl`` files
+    are journals and anything else is whole-file JSON. ``fsync`` overrides
+    the backend's default of whether each write is fsynced.
+    """
+    options = {} if fsync is None else {"fsync": fsync}
+    if path.endswith((".db", ".sqlite")):
+        return SQLiteStore(path, session_id or "default", **options)
+    if path.endswith(".jsonl"):
+        # Picks up history saved by versions that wrote chat_history.json.
+        return JournalStore(path, legacy_path=path[:-1], **options)
+    return JSONFileStore(path)
@@ -0,0 +1,209 @@
+"""Load-test the chat path against a local mock Groq server.
+
+No API key or network is used. Modes:
+
+    sessions   N concurrent ConversationManager sessions; reports throughput,
+               latency and time-to-first-token percentiles and the cost of
+               persisting history
+    async      thread-per-request serving vs AsyncConversationManager
+    hedge      threaded serving with and without request hedging
+
+    python load_test.py sessions --sessions 50 --turns 5 --profile groq
+    python load_test.py async --sessions 200 --threads 32
+    python load_test.py hedge --profile slow-tail
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_groq_server import DEFAULT_CONFIG, PROFILES, start_mock_server
+
+
+def percentile(samples, q):
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def describe(name, samples, unit=1000, suffix="ms"):
+    return (f"{name:<12} p50 {percentile(samples, 0.5) * unit:8.1f}{suffix}  "
+            f"p95 {percentile(samples, 0.95) * unit:8.1f}{suffix}  "
+            f"p99 {percentile(samples, 0.99) * unit:8.1f}{suffix}")
+
+
+def timed_store(store, samples, lock):
+    """Record how long every history write takes on ``store``."""
+    apply = store.apply
+
+    def timed_apply(ops):
+        start = time.perf_counter()
+        try:
+            apply(ops)
+        finally:
+            with lock:
+                samples.append(time.perf_counter() - start)
+
+    store.apply = timed_apply
+    return store
+
+
+def run_sessions(sessions, turns, history_dir, history_format, stream=True, durability="sync"):
+    from chatbot import ConversationManager
+
+    lock = threading.Lock()
+    latencies, ttfts, persist, errors = [], [], [], []
+
+    def run_session(index):
+        manager = ConversationManager(
+            api_key="mock",
+            history_file=os.path.join(history_dir, f"session.{history_format}")
+            if history_format in ("db", "sqlite")
+            else os.path.join(history_dir, f"session-{index}.{history_format}"),
+            session_id=f"session-{index}",
+            durability=durability
+        )
+        timed_store(manager.history_store, persist, lock)
+
+        for turn in range(turns):
+            prompt = f"session {index} question {turn}"
+            start = time.perf_counter()
+            first = None
+            try:
+                if stream:
+                    for _ in manager.chat_completion_stream(prompt):
+                        if first is None:
+                            first = time.perf_counter() - start
+                else:
+                    manager.chat_completion(prompt)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                if first is not None:
+                    ttfts.append(first)
+        manager.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(run_session, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(latencies)} turns in {elapsed:.2f}s  ({len(latencies) / elapsed:.1f} turns/s, "
+          f"{len(errors)} errors)")
+    print(describe("latency", latencies))
+    if ttfts:
+        print(describe("TTFT", ttfts))
+    print(describe("persist", persist))
+    if errors:
+        print(f"first error: {errors[0]!r}")
+
+
+def run_threaded(sessions, turns, threads, history_dir, hedger=None, prefix="thread"):
+    """Serve sessions from a thread pool; ``prefix`` keeps each run's history files apart."""
+    from chatbot import ConversationManager
+
+    latencies = []
+
+    def run_session(index):
+        manager = ConversationManager(
+            api_key="mock",
+            history_file=os.path.join(history_dir, f"{prefix}-{index}.jsonl"),
+            hedger=hedger
+        )
+        for turn in range(turns):
+            start = time.perf_counter()
+            manager.chat_completion(f"session {index} question {turn}")
+            latencies.append(time.perf_counter() - start)
+        manager.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run_session, range(sessions)))
+    return time.perf_counter() - start, latencies
+
+
+async def run_async(sessions, turns, history_dir):
+    from async_chatbot import AsyncConversationManager
+
+    latencies = []
+
+    async def run_session(index):
+        manager = await AsyncConversationManager.create(
+            api_key="mock",
+            history_file=os.path.join(history_dir, f"async-{index}.jsonl")
+        )
+        for turn in range(turns):
+            start = time.perf_counter()
+            await manager.chat_completion(f"session {index} question {turn}")
+            latencies.append(time.perf_counter() - start)
+        await manager.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i) for i in range(sessions)))
+    return time.perf_counter() - start, latencies
+
+
+def report(label, elapsed, latencies):
+    print(f"{label:<28} {elapsed:8.2f}s  {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50 {percentile(latencies, 0.5) * 1000:7.1f}ms  p95 {percentile(latencies, 0.95) * 1000:7.1f}ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", nargs="?", choices=["sessions", "async", "hedge"], default="sessions")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=32, help="Worker threads for async/hedge modes")
+    parser.add_argument("--history-format", choices=["jsonl", "json", "db"], default="jsonl",
+                        help="History store used by sessions mode")
+    parser.add_argument("--no-stream", action="store_true", help="Use chat_completion() in sessions mode")
+    parser.add_argument("--durability", default="sync",
+                        help='History durability for sessions mode: "sync", "turn" or a flush interval in ms')
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default",
+                        help="Mock server profile")
+    for name, default in DEFAULT_CONFIG.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=None,
+                            help=f"Override the mock profile's {name}")
+    args = parser.parse_args()
+
+    overrides = {name: getattr(args, name) for name in DEFAULT_CONFIG if getattr(args, name) is not None}
+    server = start_mock_server(profile=args.profile, **overrides)
+    os.environ["GROQ_BASE_URL"] = server.base_url
+    print(f"mock profile {args.profile}: {server.config}")
+
+    with tempfile.TemporaryDirectory() as history_dir:
+        if args.mode == "sessions":
+            durability = args.durability if args.durability in ("sync", "turn") else float(args.durability)
+            run_sessions(args.sessions, args.turns, history_dir, args.history_format, not args.no_stream,
+                         durability)
+        elif args.mode == "hedge":
+            from hedging import Hedger
+
+            report("threads, no hedging", *run_threaded(args.sessions, args.turns, args.threads,
+                                                        history_dir, prefix="plain"))
+            hedger = Hedger(percentile=0.9, max_extra_fraction=0.1)
+            report("threads, hedged", *run_threaded(args.sessions, args.turns, args.threads,
+                                                    history_dir, hedger, prefix="hedged"))
+            print(hedger.stats())
+        else:
+            threaded, latencies = run_threaded(args.sessions, args.turns, args.threads, history_dir)
+            report(f"threads ({args.threads} workers)", threaded, latencies)
+
+            concurrent, latencies = asyncio.run(run_async(args.sessions, args.turns, history_dir))
+            report("asyncio (1 event loop)", concurrent, latencies)
+            print(f"speedup: {threaded / concurrent:.1f}x")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Local stand-in for the Groq chat completions endpoint.
+
+Point the Groq SDK at it with ``GROQ_BASE_URL=http://127.0.0.1:<port>``.
+Behaviour comes from a named profile (see PROFILES) plus per-setting
+overrides: base latency and jitter, a slow tail, generation speed in
+tokens per second, reply length, and injected errors.
+"""
+import time
+import json
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_CONFIG = {
+    "latency": 0.2,            # seconds before the first token
+    "jitter": 0.0,             # +/- uniform noise added to latency
+    "slow_fraction": 0.0,      # share of requests that take slow_latency instead
+    "slow_latency": 2.0,
+    "tokens_per_second": 0,    # generation speed; 0 sends the reply instantly
+    "reply_tokens": 0,         # pad replies to this many words; 0 echoes the prompt only
+    "error_rate": 0.0,         # share of requests answered with error_status
+    "error_status": 503,
+    "retry_after": 1,          # Retry-After seconds sent with 429 errors
+}
+
+PROFILES = {
+    "default": {},
+    "instant": {"latency": 0.0},
+    "groq": {"latency": 0.15, "jitter": 0.05, "tokens_per_second": 800, "reply_tokens": 200},
+    "slow-tail": {"slow_fraction": 0.05, "slow_latency": 2.0},
+    "flaky": {"error_rate": 0.1, "error_status": 503},
+    "rate-limited": {"error_rate": 0.2, "error_status": 429},
+}
+
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        config = self.server.config
+        time.sleep(self.server.sample_latency())
+
+        if config["error_rate"] and random.random() < config["error_rate"]:
+            self._send_error_response(config["error_status"])
+            return
+
+        messages = request.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        words = f"Mock reply to: {prompt}".split(" ")
+        if len(words) < config["reply_tokens"]:
+            words += ["token"] * (config["reply_tokens"] - len(words))
+        reply = " ".join(words)
+        model = request.get("model", "mock")
+        completion_id = f"chatcmpl-mock-{time.time_ns()}"
+
+        if request.get("stream"):
+            self._stream_reply(completion_id, model, words)
+            return
+
+        if config["tokens_per_second"]:
+            time.sleep(len(words) / config["tokens_per_second"])
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": sum(len(m.get("content", "").split()) for m in messages),
+                "completion_tokens": len(reply.split()),
+                "total_tokens": 0
+            }
+        })
+
+    def _send_error_response(self, status):
+        messages = {
+            429: ("Rate limit reached (mock)", "rate_limit_exceeded"),
+            500: ("Internal server error (mock)", "internal_server_error"),
+            503: ("Service unavailable (mock)", "service_unavailable"),
+        }
+        message, code = messages.get(status, ("Error (mock)", "error"))
+        headers = {"retry-after": str(self.server.config["retry_after"])} if status == 429 else {}
+        self._send_json(status, {"error": {"message": message, "type": "mock_error", "code": code}}, headers)
+
+    def _stream_reply(self, completion_id, model, words):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        tokens_per_second = self.server.config["tokens_per_second"]
+        try:
+            for i, word in enumerate(words):
+                if i and tokens_per_second:
+                    time.sleep(1 / tokens_per_second)
+                delta = {"content": word if i == 0 else " " + word}
+                if i == 0:
+                    delta["role"] = "assistant"
+                self._send_event({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+                })
+            self._send_event({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            })
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the request (e.g. a losing hedge).
+            self.close_connection = True
+
+    def _send_event(self, payload):
+        self._send_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host="127.0.0.1", port=0, profile="default", **overrides):
+        super().__init__((host, port), MockGroqHandler)
+        unknown = set(overrides) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise TypeError(f"Unknown mock server settings: {', '.join(sorted(unknown))}")
+        self.config = {**DEFAULT_CONFIG, **PROFILES[profile], **overrides}
+
+    def sample_latency(self):
+        config = self.config
+        if config["slow_fraction"] and random.random() < config["slow_fraction"]:
+            return config["slow_latency"]
+        return max(config["latency"] + random.uniform(-config["jitter"], config["jitter"]), 0.0)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_mock_server(host="127.0.0.1", port=0, profile="default", **overrides):
+    """Start a MockGroqServer in a daemon thread and return it."""
+    server = MockGroqServer(host, port, profile, **overrides)
+    threading.Thread(target=server.serve_forever, name="mock-groq", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock Groq chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    for name, default in DEFAULT_CONFIG.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(default), default=None,
+                            help=f"Override the profile's {name} (default {default})")
+    args = parser.parse_args()
+
+    overrides = {name: getattr(args, name) for name in DEFAULT_CONFIG if getattr(args, name) is not None}
+    server = MockGroqServer(args.host, args.port, args.profile, **overrides)
+    print(f"Mock Groq server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
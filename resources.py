@@ -0,0 +1,211 @@
+"""Process-wide Groq clients and tiktoken encoders.
+
+Every ConversationManager in the process shares these, so connections are
+pooled across sessions and the BPE ranks are loaded once. All getters are
+lazy and thread-safe.
+"""
+import os
+import socket
+import threading
+from contextlib import contextmanager
+
+import httpx
+import tiktoken
+from groq import AsyncGroq, Groq
+from tiktoken.load import load_tiktoken_bpe
+
+
+# Set to a vendored copy of cl100k_base.tiktoken to avoid any download on cold start.
+ENCODER_FILE_ENV = "TIKTOKEN_ENCODER_FILE"
+
+CL100K_PATTERN = (
+    r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}| ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+)
+CL100K_SPECIAL_TOKENS = {
+    "<|endoftext|>": 100257,
+    "<|fim_prefix|>": 100258,
+    "<|fim_middle|>": 100259,
+    "<|fim_suffix|>": 100260,
+    "<|endofprompt|>": 100276,
+}
+
+HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=60)
+
+_lock = threading.Lock()
+_abort_scopes = threading.local()
+_clients = {}
+_async_clients = {}
+_encoders = {}
+
+
+class RequestAborted(BaseException):
+    """Raised in a thread whose request was aborted with AbortScope.abort().
+
+    Like asyncio.CancelledError it is not an Exception, so retry and
+    failover handlers let it through instead of resending the request.
+    """
+
+
+class AbortScope:
+    """Connections opened by requests inside ``abortable()``, so another thread can cut them."""
+
+    def __init__(self):
+        self.aborted = False
+        self._sockets = []
+        self._lock = threading.Lock()
+
+    def _attach(self, sock):
+        with self._lock:
+            if not self.aborted:
+                self._sockets.append(sock)
+                return
+        self._shutdown(sock)
+
+    @staticmethod
+    def _shutdown(sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already closed
+
+    def abort(self):
+        """Shut down the scope's connections; a blocked request fails with RequestAborted."""
+        with self._lock:
+            self.aborted = True
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            self._shutdown(sock)
+
+
+@contextmanager
+def abortable():
+    """Make the Groq requests this thread sends inside the block abortable.
+
+    Yields an AbortScope. Calling its ``abort()`` from any thread interrupts
+    the request even while it is still waiting for response headers, which
+    closing a stream cannot do.
+    """
+    scope = AbortScope()
+    previous = getattr(_abort_scopes, "scope", None)
+    _abort_scopes.scope = scope
+    try:
+        yield scope
+    finally:
+        _abort_scopes.scope = previous
+
+
+class AbortableTransport(httpx.HTTPTransport):
+    """Pooled HTTP transport that can abort requests sent inside ``abortable()``.
+
+    Those requests skip the keep-alive pool and get a connection of their
+    own: only a socket opened for the request can be found, through
+    httpcore's trace hook, before its response arrives. Everything else,
+    such as the primary of a hedged request, reuses pooled connections.
+    """
+
+    def __init__(self, limits=HTTP_LIMITS):
+        super().__init__(limits=limits)
+        self._dedicated = httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=limits.max_connections, max_keepalive_connections=0)
+        )
+
+    def handle_request(self, request):
+        scope = getattr(_abort_scopes, "scope", None)
+        if scope is None:
+            return super().handle_request(request)
+        if scope.aborted:
+            raise RequestAborted()
+
+        trace = request.extensions.get("trace")
+
+        def capture(event, info):
+            if event in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+                scope._attach(info["return_value"].get_extra_info("socket"))
+            if trace is not None:
+                trace(event, info)
+
+        request.extensions = {**request.extensions, "trace": capture}
+        try:
+            return self._dedicated.handle_request(request)
+        except Exception:
+            if scope.aborted:
+                raise RequestAborted() from None
+            raise
+
+    def close(self):
+        super().close()
+        self._dedicated.close()
+
+
+def get_groq_client(api_key, base_url=None):
+    """Return the shared Groq client for this key, creating it on first use."""
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = Groq(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=httpx.Client(transport=AbortableTransport(HTTP_LIMITS))
+                )
+                _clients[key] = client
+    return client
+
+
+def get_async_groq_client(api_key, base_url=None):
+    """Return the shared AsyncGroq client for this key.
+
+    Async connection pools belong to the event loop that opened them, so
+    this is meant for processes serving from a single loop.
+    """
+    key = (api_key, base_url)
+    client = _async_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(key)
+            if client is None:
+                client = AsyncGroq(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=httpx.AsyncClient(limits=HTTP_LIMITS)
+                )
+                _async_clients[key] = client
+    return client
+
+
+def _load_encoder(name, path):
+    if path is None:
+        return tiktoken.get_encoding(name)
+
+    if name != "cl100k_base":
+        raise ValueError(f"Loading {name} from a local file is not supported")
+
+    return tiktoken.Encoding(
+        name=name,
+        pat_str=CL100K_PATTERN,
+        mergeable_ranks=load_tiktoken_bpe(path),
+        special_tokens=CL100K_SPECIAL_TOKENS
+    )
+
+
+def get_encoder(name="cl100k_base", path=None):
+    """Return the shared tiktoken encoder.
+
+    If ``path`` (or the TIKTOKEN_ENCODER_FILE environment variable) points at
+    a local ``.tiktoken`` file, the ranks are read from it instead of the
+    tiktoken download cache.
+    """
+    if path is None:
+        path = os.getenv(ENCODER_FILE_ENV)
+
+    key = (name, path)
+    encoder = _encoders.get(key)
+    if encoder is None:
+        with _lock:
+            encoder = _encoders.get(key)
+            if encoder is None:
+                encoder = _load_encoder(name, path)
+                _encoders[key] = encoder
+    return encoder
@@ -0,0 +1,150 @@
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU + TTL cache of assistant replies keyed by the exact request.
+
+    The key covers the model, sampling parameters and the full (trimmed)
+    message list, including the persona's system message. Message text is
+    whitespace-normalized so trivially different prompts share an entry.
+    If ``path`` is given, entries are also kept in a SQLite file so they
+    survive restarts; a disk hit is promoted back into memory. The file is
+    pruned every ``PRUNE_INTERVAL`` writes: expired rows are dropped and it
+    is cut back to the ``max_disk_entries`` newest rows (default:
+    ``max_entries``).
+    """
+
+    PRUNE_INTERVAL = 64
+
+    def __init__(self, max_entries=1024, ttl=3600, path=None, max_disk_entries=None):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries or max_entries
+        self.ttl = ttl
+        self.path = path
+        self._writes = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, reply TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_responses_expiry ON responses (expires_at)")
+            with self._db:
+                self._prune_disk(time.time())
+
+    @staticmethod
+    def make_key(params):
+        messages = [
+            (m["role"], " ".join((m.get("content") or "").split()))
+            for m in params["messages"]
+        ]
+        payload = json.dumps(
+            [params.get("model"), params.get("temperature"), params.get("max_tokens"), messages],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, reply = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return reply
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT reply, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, reply):
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._remember(key, expires_at, reply)
+
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, reply, expires_at) VALUES (?, ?, ?)",
+                        (key, reply, expires_at)
+                    )
+                    self._writes += 1
+                    if self._writes % self.PRUNE_INTERVAL == 0:
+                        self._prune_disk(time.time())
+
+    def _prune_disk(self, now):
+        # Every entry gets the same TTL, so the soonest to expire are the oldest.
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def _remember(self, key, expires_at, reply):
+        self._entries[key] = (expires_at, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def purge_expired(self):
+        now = time.time()
+
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+
+            if self._db is not None:
+                with self._db:
+                    self._prune_disk(now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries)
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
@@ -1,6 +1,19 @@
+import io
+import os
 import re
+import json
+import time
+import atexit
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict, deque
 from typing import Dict, List, Tuple
 
+import metrics
+from resume_document import ResumeDocument
+
 try:
     import pypdf
 except ImportError:
@@ -11,6 +24,69 @@ try:
 except ImportError:
     docx = None
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# One page-extraction pool per process, started on first use and kept, so
+# a large upload pays for the pool only once. Callers are counted per pool:
+# a caller that gives up on a stuck page retires the pool, so later callers
+# get a fresh one, and the retired pool is killed once nobody uses it.
+_pdf_pool = None
+_pdf_pool_users = {}
+_pdf_pool_lock = threading.Lock()
+# In a worker: the PDFs it parsed last, by content hash. A few are kept so
+# that pages of concurrent uploads can interleave without re-parsing.
+_pdf_readers = OrderedDict()
+_PDF_READERS_PER_WORKER = 2
+
+
+def _acquire_pdf_pool(workers):
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Forked from a fork server rather than from this process: the
+            # app server is multi-threaded, and a forked copy of it can deadlock.
+            _pdf_pool = multiprocessing.get_context("forkserver").Pool(workers)
+            _pdf_pool_users[_pdf_pool] = 0
+        _pdf_pool_users[_pdf_pool] += 1
+        return _pdf_pool
+
+
+def _release_pdf_pool(pool, stuck=False):
+    """Stop using ``pool``; ``stuck`` retires it because one of its workers may never finish."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if stuck and _pdf_pool is pool:
+            _pdf_pool = None
+        _pdf_pool_users[pool] -= 1
+        if _pdf_pool is pool or _pdf_pool_users[pool]:
+            return
+        del _pdf_pool_users[pool]
+    pool.terminate()
+
+
+@atexit.register
+def _close_pdf_pools():
+    with _pdf_pool_lock:
+        pools = list(_pdf_pool_users)
+    for pool in pools:
+        pool.terminate()
+
+
+def _extract_pdf_pages(content_hash, path, start, stop):
+    reader = _pdf_readers.get(content_hash)
+    if reader is None:
+        # pypdf reads the whole file in, so the caller may delete it afterwards.
+        reader = pypdf.PdfReader(path)
+        _pdf_readers[content_hash] = reader
+        while len(_pdf_readers) > _PDF_READERS_PER_WORKER:
+            _pdf_readers.popitem(last=False)
+    _pdf_readers.move_to_end(content_hash)
+    return [reader.pages[index].extract_text() for index in range(start, stop)]
+
 
 class ResumeAnalyzer:
 
@@ -61,35 +137,157 @@ class ResumeAnalyzer:
     CORE_SECTIONS = ["education", "skills", "experience", "projects"]
     OPTIONAL_SECTIONS = ["certifications", "certificates", "awards", "publications", "interests"]
 
-    def __init__(self):
+    SPECIAL_CHARS = ['@', '#', '$', '%', '^', '&', '*', '!', '~', '`']
+
+    # Compiled once; the lookahead reports overlapping section names the way
+    # substring checks would.
+    SECTION_PATTERN = re.compile("(?=(" + "|".join(CORE_SECTIONS + OPTIONAL_SECTIONS) + "))")
+    ACTION_VERB_PATTERN = re.compile(r"\b(" + "|".join(ACTION_VERBS) + r")\b")
+    # What may follow a number for it to count as a percentage, years of
+    # experience, users, projects or team size, in scoring order.
+    QUANTITY_SUFFIXES = [
+        re.compile(r"%"),
+        re.compile(r"\s*(years?|yrs?)", re.IGNORECASE),
+        None,  # dollar amounts: "$" before the number
+        re.compile(r"\s*(users?|customers?|clients?)", re.IGNORECASE),
+        re.compile(r"\s*(projects?|tasks?|features?)", re.IGNORECASE),
+        re.compile(r"\s*(team members?|employees?)", re.IGNORECASE),
+    ]
+
+    # PDF extraction limits. Pages past max_pages are never read, and
+    # extraction stops once max_chars of text is in hand, which is far more
+    # than scoring looks at.
+    PDF_MAX_PAGES = 50
+    PDF_MAX_BYTES = 20 * 1024 * 1024
+    PDF_MAX_CHARS = 100_000
+    PDF_TIMEOUT = 30.0
+    # PDFs with at least this many pages have them split across the
+    # process-wide worker pool, a few pages per task.
+    PDF_PARALLEL_PAGES = 16
+    PDF_PAGES_PER_TASK = 4
+    # Bump when extraction output changes, so cached text is not reused.
+    EXTRACTION_VERSION = 2
+
+    def __init__(self, cache=None, max_pages=None, max_bytes=None, max_chars=None,
+                 timeout=None, page_workers=None):
+        self.cache = cache
+        self.max_pages = max_pages or self.PDF_MAX_PAGES
+        self.max_bytes = max_bytes or self.PDF_MAX_BYTES
+        self.max_chars = max_chars or self.PDF_MAX_CHARS
+        self.timeout = timeout or self.PDF_TIMEOUT
+        self.page_workers = page_workers or min(os.cpu_count() or 1, 4)
         self.resume_text = ""
         self.job_role = ""
         self.matching_skills = []
         self.missing_skills = []
         self.suggestions = []
 
-    def extract_text_from_pdf(self, uploaded_file):
+    @classmethod
+    def taxonomy_version(cls):
+        """Fingerprint of everything results depend on besides the resume and role."""
+        version = cls.__dict__.get("_taxonomy_version")
+        if version is None:
+            payload = json.dumps([
+                cls.SKILL_DICTIONARY, cls.SUGGESTION_TEMPLATES, cls.ACTION_VERBS,
+                cls.CORE_SECTIONS, cls.OPTIONAL_SECTIONS, cls.SPECIAL_CHARS
+            ], sort_keys=True)
+            version = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+            cls._taxonomy_version = version
+        return version
+
+    def iter_pdf_pages(self, uploaded_file):
+        """Yield the text of each non-empty PDF page, in order, within the extraction limits.
+
+        Reads at most ``max_pages`` pages and stops once ``max_chars``
+        characters have been yielded. Raises ValueError for files over
+        ``max_bytes`` and TimeoutError once extraction has run for
+        ``timeout`` seconds.
+
+        Files under ``PDF_PARALLEL_PAGES`` pages, and every file when
+        ``page_workers`` is 1, are read in this thread, which can only check
+        the timeout between pages: one page that takes longer is not cut
+        short. batch_analyze adds a hard per-file limit in its workers.
+        """
         if pypdf is None:
             raise ImportError("Install pypdf using: pip install pypdf")
 
-        reader = pypdf.PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text
-        return text
+        data = self._read_upload(uploaded_file)
+        if len(data) > self.max_bytes:
+            raise ValueError(f"PDF is too large ({len(data) // 1024} KB); "
+                             f"the limit is {self.max_bytes // 1024} KB.")
+
+        deadline = time.monotonic() + self.timeout
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        page_count = min(len(reader.pages), self.max_pages)
+
+        if page_count >= self.PDF_PARALLEL_PAGES and self.page_workers > 1:
+            pages = self._iter_pdf_pages_parallel(data, page_count, deadline)
+        else:
+            pages = (reader.pages[index].extract_text() for index in range(page_count))
+
+        chars = 0
+        try:
+            for page_text in pages:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"PDF text extraction took longer than {self.timeout:g}s.")
+                if page_text:
+                    yield page_text
+                    chars += len(page_text)
+                    if chars >= self.max_chars:
+                        return
+        finally:
+            pages.close()
+
+    def _iter_pdf_pages_parallel(self, data, page_count, deadline):
+        content_hash = hashlib.sha256(data).hexdigest()
+        step = self.PDF_PAGES_PER_TASK
+        ranges = deque((start, min(start + step, page_count)) for start in range(0, page_count, step))
+
+        # Workers read the upload from a temporary file, once each, rather
+        # than receiving a pickled copy of it with every task.
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(data)
+        pool = None
+        stuck = False
+
+        # Only one task per worker is in flight, so stopping early leaves at
+        # most that much work behind.
+        pending = deque()
+
+        def submit():
+            start, stop = ranges.popleft()
+            pending.append(pool.apply_async(_extract_pdf_pages, (content_hash, f.name, start, stop)))
+
+        try:
+            pool = _acquire_pdf_pool(self.page_workers)
+            for _ in range(min(self.page_workers, len(ranges))):
+                submit()
+
+            while pending:
+                try:
+                    page_texts = pending.popleft().get(max(deadline - time.monotonic(), 0))
+                except multiprocessing.TimeoutError:
+                    stuck = True
+                    raise TimeoutError(f"PDF text extraction took longer than {self.timeout:g}s.") from None
+                if ranges:
+                    submit()
+                yield from page_texts
+        finally:
+            if pool is not None:
+                _release_pdf_pool(pool, stuck)
+            os.unlink(f.name)
+
+    def extract_text_from_pdf(self, uploaded_file):
+        return "\n".join(self.iter_pdf_pages(uploaded_file))
 
     def extract_text_from_docx(self, uploaded_file):
         if docx is None:
             raise ImportError("Install python-docx using: pip install python-docx")
 
         document = docx.Document(uploaded_file)
-        text = ""
-        for para in document.paragraphs:
-            text += para.text + "\n"
-        return text
+        return "".join(para.text + "\n" for para in document.paragraphs)
 
+    @metrics.timed("resume_extract_seconds")
     def extract_text(self, uploaded_file):
         name = uploaded_file.name.lower()
 
@@ -101,6 +299,21 @@ class ResumeAnalyzer:
 
         raise ValueError("Upload only PDF or DOCX files.")
 
+    def document(self, resume):
+        """Wrap resume text in a ResumeDocument over this analyzer's skill taxonomy.
+
+        Every stage accepts either text or a document; passing one document
+        through all of them means the text is normalized and scanned once.
+        """
+        if isinstance(resume, ResumeDocument):
+            return resume
+        skills = dict.fromkeys(skill for role_skills in self.SKILL_DICTIONARY.values() for skill in role_skills)
+        return ResumeDocument(resume, skills)
+
+    def find_skills(self, resume_text):
+        """Every taxonomy skill found in the text, mapped to its match positions."""
+        return self.document(resume_text).skill_hits
+
     def get_required_skills(self, job_role):
         role = job_role.lower().strip()
 
@@ -113,18 +326,20 @@ class ResumeAnalyzer:
 
         return self.SKILL_DICTIONARY["software engineer"]
 
+    @metrics.timed("resume_skill_match_seconds")
     def match_skills(self, resume_text, job_role):
-        self.resume_text = resume_text
+        document = self.document(resume_text)
+        self.resume_text = document.text
         self.job_role = job_role
 
-        resume_lower = resume_text.lower()
+        found = document.skill_hits
         required = self.get_required_skills(job_role)
 
         matching = []
         missing = []
 
         for skill in required:
-            if skill.lower() in resume_lower:
+            if skill.lower() in found:
                 matching.append(skill.title())
             else:
                 missing.append(skill.title())
@@ -160,6 +375,55 @@ class ResumeAnalyzer:
         self.suggestions = suggestions
         return suggestions
 
+    @classmethod
+    def role_matrix(cls):
+        """Return ``(roles, skills, matrix)`` for SKILL_DICTIONARY, built once per class.
+
+        ``matrix`` is a roles x skills NumPy array with a 1 wherever a role
+        requires a skill.
+        """
+        cached = cls.__dict__.get("_role_matrix")
+        if cached is not None:
+            return cached
+
+        if np is None:
+            raise ImportError("Install numpy using: pip install numpy")
+
+        roles = list(cls.SKILL_DICTIONARY)
+        skills = list(dict.fromkeys(s.lower() for role_skills in cls.SKILL_DICTIONARY.values() for s in role_skills))
+        column = {skill: index for index, skill in enumerate(skills)}
+
+        matrix = np.zeros((len(roles), len(skills)))
+        for row, role in enumerate(roles):
+            for skill in cls.SKILL_DICTIONARY[role]:
+                matrix[row, column[skill.lower()]] = 1
+
+        cls._role_matrix = (roles, skills, matrix)
+        return cls._role_matrix
+
+    def skill_vector(self, resume):
+        """0/1 vector over ``role_matrix()`` skills marking those found in the resume."""
+        _, skills, _ = self.role_matrix()
+        hits = self.document(resume).skill_hits
+        return np.fromiter((skill in hits for skill in skills), dtype=float, count=len(skills))
+
+    def score_roles(self, resumes):
+        """Match scores of many resumes against every role at once.
+
+        Returns ``(roles, scores)`` where ``scores`` is a resumes x roles
+        array of percentages, the same values calculate_match_score() gives
+        before rounding.
+        """
+        roles, skills, matrix = self.role_matrix()
+        hits = np.array([self.skill_vector(resume) for resume in resumes]).reshape(-1, len(skills))
+        return roles, (hits @ matrix.T) / matrix.sum(axis=1) * 100
+
+    def rank_roles(self, resume, top=None):
+        """Return ``(role, match score)`` pairs for one resume, best fit first."""
+        roles, scores = self.score_roles([resume])
+        order = np.argsort(-scores[0], kind="stable")[:top]
+        return [(roles[index], round(float(scores[0, index]), 1)) for index in order]
+
     def calculate_match_score(self):
         total = len(self.matching_skills) + len(self.missing_skills)
         if total == 0:
@@ -172,78 +436,103 @@ class ResumeAnalyzer:
     # ATS SCORE CALCULATION METHODS
     # ============================================================
 
+    @metrics.timed("resume_ats_features_seconds")
+    def extract_ats_features(self, resume):
+        """Everything the ATS components score, computed once per document."""
+        document = self.document(resume)
+        return document.memo((type(self), "ats_features"), lambda: self._scan_ats_features(document))
+
+    def _scan_ats_features(self, document):
+        text = document.text
+
+        # Numbers are found once; each quantity pattern then only looks at
+        # the characters around them. Examples keep the order the component
+        # patterns would list them in: by pattern, then by position.
+        quantities = [[] for _ in range(len(self.QUANTITY_SUFFIXES) + 1)]
+        for start, end in document.numbers:
+            number = text[start:end]
+            for index, suffix in enumerate(self.QUANTITY_SUFFIXES):
+                if suffix is None:
+                    if start > 0 and text[start - 1] == "$":
+                        quantities[index].append("$" + number)
+                    continue
+                match = suffix.match(text, end)
+                if match is not None:
+                    quantities[index].append(match.group(1) if match.groups() else number + match.group())
+            quantities[-1].append(number)
+
+        return {
+            "skills": document.skill_hits,
+            "sections": {m.group(1) for m in self.SECTION_PATTERN.finditer(document.lower)},
+            "verbs": {m.group(1) for m in self.ACTION_VERB_PATTERN.finditer(document.lower)},
+            "quantities": [q for found in quantities for q in found],
+            "word_count": document.word_count,
+            "char_counts": document.char_counts
+        }
+
+    @metrics.timed("resume_ats_keyword_seconds")
     def _calculate_keyword_match_score(self, resume_text, job_role):
         """Calculate keyword match score (40 points max)"""
-        resume_lower = resume_text.lower()
+        found = self.extract_ats_features(resume_text)["skills"]
         required_skills = self.get_required_skills(job_role)
         
         matching_skills = []
+        missing_skills = []
         for skill in required_skills:
-            if skill.lower() in resume_lower:
+            if skill.lower() in found:
                 matching_skills.append(skill)
+            else:
+                missing_skills.append(skill)
         
         if len(required_skills) > 0:
             score = (len(matching_skills) / len(required_skills)) * 40
         else:
             score = 0
         
-        return min(round(score, 1), 40), matching_skills
+        return min(round(score, 1), 40), matching_skills, missing_skills
 
+    @metrics.timed("resume_ats_sections_seconds")
     def _calculate_section_score(self, resume_text):
         """Calculate section presence score (20 points max)"""
-        resume_lower = resume_text.lower()
+        present = self.extract_ats_features(resume_text)["sections"]
         
         score = 0
         sections_found = []
         
         # Check core sections (5 points each)
         for section in self.CORE_SECTIONS:
-            if section in resume_lower:
+            if section in present:
                 score += 5
                 sections_found.append(section)
         
         # Check optional sections (2.5 points each, up to 10 points)
         optional_count = 0
         for section in self.OPTIONAL_SECTIONS:
-            if section in resume_lower:
+            if section in present:
                 optional_count += 1
         
         score += min(optional_count * 2.5, 10)
         
         return min(round(score, 1), 20), sections_found
 
+    @metrics.timed("resume_ats_action_verbs_seconds")
     def _calculate_action_verbs_score(self, resume_text):
         """Calculate action verbs score (10 points max)"""
-        resume_lower = resume_text.lower()
+        present = self.extract_ats_features(resume_text)["verbs"]
         
-        found_verbs = []
-        for verb in self.ACTION_VERBS:
-            # Use word boundary matching
-            if re.search(r'\b' + verb + r'\b', resume_lower):
-                found_verbs.append(verb)
+        found_verbs = [verb for verb in self.ACTION_VERBS if verb in present]
         
         # Give 2 points per unique action verb found, max 10
         score = min(len(found_verbs) * 2, 10)
         
         return round(score, 1), found_verbs
 
+    @metrics.timed("resume_ats_quantification_seconds")
     def _calculate_quantification_score(self, resume_text):
         """Calculate quantification score (10 points max) - prefers numbers"""
-        # Check for percentages, numbers, and metrics
-        patterns = [
-            r'\d+%',           # Percentages like 50%
-            r'\d+\s*(years?|yrs?)',  # Years of experience
-            r'\$\d+',          # Dollar amounts
-            r'\d+\s*(users?|customers?|clients?)',  # User counts
-            r'\d+\s*(projects?|tasks?|features?)',    # Project counts
-            r'\d+\s*(team members?|employees?)',     # Team sizes
-            r'\d+',            # Any standalone number
-        ]
-        
-        matches = []
-        for pattern in patterns:
-            found = re.findall(pattern, resume_text, re.IGNORECASE)
-            matches.extend(found)
+        # Percentages, years, dollar amounts, user/project/team counts and
+        # any other number, as collected by extract_ats_features()
+        matches = self.extract_ats_features(resume_text)["quantities"]
         
         # Give points based on unique quantification instances
         unique_matches = len(set(matches))
@@ -257,13 +546,16 @@ class ResumeAnalyzer:
         else:
             return 0.0, []
 
+    @metrics.timed("resume_ats_formatting_seconds")
     def _calculate_formatting_score(self, resume_text):
         """Calculate formatting simplicity score (20 points max)"""
+        features = self.extract_ats_features(resume_text)
+        char_counts = features["char_counts"]
         score = 20
         issues = []
         
         # Word count check
-        word_count = len(resume_text.split())
+        word_count = features["word_count"]
         
         if word_count < 300:
             score -= 10
@@ -280,20 +572,20 @@ class ResumeAnalyzer:
             issues.append("Consider keeping resume under 2 pages")
         
         # Special characters check
-        special_chars = ['@', '#', '$', '%', '^', '&', '*', '!', '~', '`']
-        special_count = sum(1 for char in special_chars if char in resume_text)
+        special_count = sum(1 for char in self.SPECIAL_CHARS if char_counts[char])
         
         if special_count > 5:
             score -= 5
             issues.append("Too many special characters")
         
         # Check for excessive symbols or formatting issues
-        if resume_text.count('|') > 10 or resume_text.count('•') > 20:
+        if char_counts['|'] > 10 or char_counts['•'] > 20:
             score -= 3
             issues.append("Excessive bullet points or symbols")
         
         return max(round(score, 1), 0), issues
 
+    @metrics.timed("resume_ats_total_seconds")
     def calculate_ats_score(self, resume_text, job_role):
         """
         Calculate comprehensive ATS score for the resume.
@@ -304,12 +596,13 @@ class ResumeAnalyzer:
                 - breakdown: dict with individual component scores
                 - suggestions: list of improvement suggestions
         """
-        # Calculate individual components
-        keyword_score, matched_skills = self._calculate_keyword_match_score(resume_text, job_role)
-        section_score, sections_found = self._calculate_section_score(resume_text)
-        action_verbs_score, verbs_found = self._calculate_action_verbs_score(resume_text)
-        quantification_score, quantifications = self._calculate_quantification_score(resume_text)
-        formatting_score, formatting_issues = self._calculate_formatting_score(resume_text)
+        # Calculate individual components; they share one scan of the document
+        document = self.document(resume_text)
+        keyword_score, matched_skills, missing_skills = self._calculate_keyword_match_score(document, job_role)
+        section_score, sections_found = self._calculate_section_score(document)
+        action_verbs_score, verbs_found = self._calculate_action_verbs_score(document)
+        quantification_score, quantifications = self._calculate_quantification_score(document)
+        formatting_score, formatting_issues = self._calculate_formatting_score(document)
         
         # Calculate total score
         total_score = int(keyword_score + section_score + action_verbs_score + 
@@ -320,10 +613,8 @@ class ResumeAnalyzer:
         
         # Keyword suggestions
         if keyword_score < 30:
-            required_skills = self.get_required_skills(job_role)
-            missing_tech = [s for s in required_skills if s.lower() not in resume_text.lower()]
-            if missing_tech:
-                missing_str = ", ".join(missing_tech[:5])
+            if missing_skills:
+                missing_str = ", ".join(missing_skills[:5])
                 suggestions.append(f"Add missing technical skills like {missing_str}.")
         
         # Section suggestions
@@ -380,18 +671,60 @@ class ResumeAnalyzer:
             "suggestions": suggestions
         }
 
-    def analyze(self, uploaded_file, job_role):
-        text = self.extract_text(uploaded_file)
+    @staticmethod
+    def _read_upload(uploaded_file):
+        if hasattr(uploaded_file, "getvalue"):
+            return uploaded_file.getvalue()
 
-        matching, missing = self.match_skills(text, job_role)
+        data = uploaded_file.read()
+        uploaded_file.seek(0)
+        return data
+
+    @metrics.timed("resume_analyze_seconds")
+    def analyze(self, uploaded_file, job_role):
+        if self.cache is None:
+            return self.analyze_text(self.extract_text(uploaded_file), job_role)
+
+        content_hash = self.cache.content_hash(self._read_upload(uploaded_file))
+        # Extracted text, and so every result, depends on the extraction
+        # limits as well as the file.
+        extraction = f"{self.EXTRACTION_VERSION}:{self.max_pages}:{self.max_chars}"
+        key = (content_hash, job_role.lower().strip(), self.taxonomy_version(), extraction)
+
+        results = self.cache.get_result(key)
+        if results is not None:
+            metrics.inc("resume_result_cache_hits_total")
+            results["job_role"] = job_role
+            self.resume_text = results["resume_text"]
+            self.job_role = job_role
+            self.matching_skills = list(results["matching_skills"])
+            self.missing_skills = list(results["missing_skills"])
+            self.suggestions = list(results["suggestions"])
+            return results
+
+        text_key = f"{content_hash}:{extraction}"
+        text = self.cache.get_text(text_key)
+        if text is None:
+            text = self.extract_text(uploaded_file)
+            self.cache.set_text(text_key, text)
+
+        results = self.analyze_text(text, job_role)
+        self.cache.set_result(key, results)
+        return results
+
+    def analyze_text(self, text, job_role):
+        """Analyze already extracted resume text (or a ResumeDocument) for one role."""
+        document = self.document(text)
+
+        matching, missing = self.match_skills(document, job_role)
         suggestions = self.generate_suggestions()
         score = self.calculate_match_score()
         
         # Calculate ATS score
-        ats_result = self.calculate_ats_score(text, job_role)
+        ats_result = self.calculate_ats_score(document, job_role)
 
         return {
-            "resume_text": text,
+            "resume_text": document.text,
             "job_role": job_role,
             "matching_skills": matching,
             "missing_skills": missing,
@@ -0,0 +1,139 @@
+import copy
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class ResumeCache:
+    """Caches resume work keyed by the SHA-256 of the uploaded file's bytes.
+
+    Two LRU tiers: extracted text per content hash, so an unchanged upload is
+    never parsed twice, and analysis results per (content hash, job role,
+    taxonomy version), so switching roles only re-runs the scoring. If
+    ``path`` is given, extracted text is also kept in a SQLite file so it
+    survives restarts; a disk hit is promoted back into memory. The file is
+    pruned every ``PRUNE_INTERVAL`` writes down to the ``max_disk_entries``
+    most recently written texts (default: ``max_texts``).
+    """
+
+    PRUNE_INTERVAL = 64
+
+    def __init__(self, max_texts=128, max_results=512, path=None, max_disk_entries=None):
+        self.max_texts = max_texts
+        self.max_results = max_results
+        self.max_disk_entries = max_disk_entries or max_texts
+        self.path = path
+        self._writes = 0
+
+        self._texts = OrderedDict()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.text_hits = 0
+        self.text_misses = 0
+        self.result_hits = 0
+        self.result_misses = 0
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS extracted_text "
+                "(content_hash TEXT PRIMARY KEY, text TEXT NOT NULL)"
+            )
+
+    @staticmethod
+    def content_hash(data):
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _remember(entries, key, value, max_entries):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+
+    def get_text(self, key):
+        """Return the text cached under ``key`` (content hash plus extraction settings), or None."""
+        with self._lock:
+            text = self._texts.get(key)
+            if text is not None:
+                self._texts.move_to_end(key)
+                self.text_hits += 1
+                return text
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT text FROM extracted_text WHERE content_hash = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._remember(self._texts, key, row[0], self.max_texts)
+                    self.text_hits += 1
+                    return row[0]
+
+            self.text_misses += 1
+            return None
+
+    def set_text(self, key, text):
+        with self._lock:
+            self._remember(self._texts, key, text, self.max_texts)
+
+            if self._db is not None:
+                with self._db:
+                    # The column keeps its old name; it holds the full key.
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO extracted_text (content_hash, text) VALUES (?, ?)",
+                        (key, text)
+                    )
+                    self._writes += 1
+                    if self._writes % self.PRUNE_INTERVAL == 0:
+                        self._prune_disk()
+
+    def _prune_disk(self):
+        # A replaced row is re-inserted, so rowid order is the order of the latest writes.
+        self._db.execute(
+            "DELETE FROM extracted_text WHERE rowid IN "
+            "(SELECT rowid FROM extracted_text ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def get_result(self, key):
+        """Return a copy of the cached analysis for ``key``, or None."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                self.result_misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.result_hits += 1
+        return copy.deepcopy(result)
+
+    def set_result(self, key, result):
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._remember(self._results, key, result, self.max_results)
+
+    def clear(self):
+        with self._lock:
+            self._texts.clear()
+            self._results.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM extracted_text")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "text_hits": self.text_hits,
+                "text_misses": self.text_misses,
+                "result_hits": self.result_hits,
+                "result_misses": self.result_misses,
+                "texts": len(self._texts),
+                "results": len(self._results)
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
@@ -0,0 +1,70 @@
+import re
+import threading
+from collections import Counter
+from functools import cached_property
+
+from skill_matcher import SkillMatcher
+
+
+class ResumeDocument:
+    """Immutable resume text with lazily computed, cached views.
+
+    The raw text never changes, so every view (lowercase text, words,
+    character counts, number spans, skill hits) is computed at most once,
+    the first time an analysis stage asks for it. Stage-specific results
+    can be cached alongside them with ``memo()``.
+
+    Spans are ``(start, end)`` offsets into ``text``.
+    """
+
+    NUMBER_PATTERN = re.compile(r"\d+")
+
+    def __init__(self, text, skills=()):
+        self.__dict__["text"] = text
+        self.__dict__["skills"] = tuple(skills)
+        self.__dict__["_memo"] = {}
+        self.__dict__["_memo_lock"] = threading.Lock()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ResumeDocument is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ResumeDocument is immutable")
+
+    def __len__(self):
+        return len(self.text)
+
+    @cached_property
+    def lower(self):
+        return self.text.lower()
+
+    @cached_property
+    def words(self):
+        """Whitespace-separated words, as ``str.split()`` gives them."""
+        return tuple(self.text.split())
+
+    @cached_property
+    def word_count(self):
+        return len(self.words)
+
+    @cached_property
+    def char_counts(self):
+        return Counter(self.text)
+
+    @cached_property
+    def numbers(self):
+        return tuple(m.span() for m in self.NUMBER_PATTERN.finditer(self.text))
+
+    @cached_property
+    def skill_hits(self):
+        """Map each skill of ``skills`` found in the text to its match spans."""
+        return SkillMatcher.for_skills(self.skills).find(self.text)
+
+    def memo(self, key, compute):
+        """Return ``compute()`` cached under ``key`` for the life of the document."""
+        with self._memo_lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = compute()
+        with self._memo_lock:
+            return self._memo.setdefault(key, value)
@@ -0,0 +1,200 @@
+"""Persistent skill index over a resume corpus for top-k search by role.
+
+    python resume_index.py add resumes/ --db resumes.db
+    python resume_index.py search "DevOps Engineer" -k 50 --db resumes.db
+    python resume_index.py remove resumes/old.pdf --db resumes.db
+"""
+import time
+import logging
+import sqlite3
+import argparse
+import threading
+
+from resume_analyzer import ResumeAnalyzer
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResumeIndex:
+    """Skill -> resume posting lists in a SQLite file.
+
+    Each resume is indexed once, by the skills the analyzer finds in it;
+    adding a resume under an existing key replaces its postings. A role
+    query counts, per resume, how many of the role's required skills it has
+    by reading only those skills' postings, so its cost depends on how many
+    resumes have the skills rather than on the size of the corpus text.
+    Scores are the ones calculate_match_score() and the ATS keyword
+    component would give.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS resumes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            resume_key TEXT NOT NULL UNIQUE,
+            skill_count INTEGER NOT NULL,
+            added_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            skill TEXT NOT NULL,
+            resume_id INTEGER NOT NULL,
+            PRIMARY KEY (skill, resume_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_postings_resume ON postings (resume_id);
+    """
+
+    def __init__(self, path, analyzer=None):
+        self.path = path
+        self.analyzer = analyzer or ResumeAnalyzer()
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+        version = self.analyzer.taxonomy_version()
+        with self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'taxonomy_version'").fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO meta (name, value) VALUES ('taxonomy_version', ?)", (version,))
+            elif row[0] != version:
+                logger.warning("Resume index %s was built with another skill taxonomy; "
+                               "re-add resumes to pick up the changes", path)
+
+    def add(self, key, resume):
+        """Index a resume (text or ResumeDocument) under ``key``, replacing any earlier entry."""
+        self.add_skills(key, self.analyzer.find_skills(resume))
+
+    def add_skills(self, key, skills):
+        """Index already extracted skills under ``key``."""
+        skills = {skill.lower() for skill in skills}
+        with self._lock, self._conn:
+            self._delete(key)
+            cursor = self._conn.execute(
+                "INSERT INTO resumes (resume_key, skill_count, added_at) VALUES (?, ?, ?)",
+                (key, len(skills), time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (skill, resume_id) VALUES (?, ?)",
+                [(skill, cursor.lastrowid) for skill in skills]
+            )
+
+    def _delete(self, key):
+        row = self._conn.execute("SELECT id FROM resumes WHERE resume_key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        self._conn.execute("DELETE FROM postings WHERE resume_id = ?", (row[0],))
+        self._conn.execute("DELETE FROM resumes WHERE id = ?", (row[0],))
+        return True
+
+    def remove(self, key):
+        with self._lock, self._conn:
+            return self._delete(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM resumes WHERE resume_key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+
+    def search(self, job_role, k=50):
+        """Return the ``k`` best resumes for a role, best first.
+
+        Each result is a dict with the resume key, its match score, its ATS
+        keyword score and the required skills it has. Ties keep the order
+        resumes were added in.
+        """
+        required = self.analyzer.get_required_skills(job_role)
+        if not required:
+            return []
+        names = {skill.lower(): skill for skill in required}
+
+        placeholders = ", ".join("?" for _ in names)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT r.resume_key, group_concat(p.skill, '\n') FROM postings p "
+                f"JOIN resumes r ON r.id = p.resume_id "
+                f"WHERE p.skill IN ({placeholders}) "
+                f"GROUP BY p.resume_id ORDER BY COUNT(*) DESC, p.resume_id LIMIT ?",
+                [*names, k]
+            ).fetchall()
+
+        results = []
+        for key, skills in rows:
+            found = set(skills.split("\n"))
+            matched = [skill for skill in required if skill.lower() in found]
+            results.append({
+                "resume": key,
+                "match_score": round(len(matched) / len(required) * 100, 1),
+                "keyword_score": min(round(len(matched) / len(required) * 40, 1), 40),
+                "matched_skills": matched
+            })
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    from batch_analyze import extract_skills, iter_file_results, iter_resume_files
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="resume_index.db", help="Index file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Index a directory of resumes or a manifest")
+    add.add_argument("source")
+    add.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    add.add_argument("--reindex", action="store_true", help="Re-extract resumes that are already indexed")
+
+    search = commands.add_parser("search", help="Top-k resumes for a role")
+    search.add_argument("role")
+    search.add_argument("-k", type=int, default=50)
+
+    remove = commands.add_parser("remove", help="Drop resumes from the index")
+    remove.add_argument("keys", nargs="+")
+
+    args = parser.parse_args()
+    index = ResumeIndex(args.db)
+
+    if args.command == "add":
+        paths = [p for p in iter_resume_files(args.source) if args.reindex or p not in index]
+        start = time.perf_counter()
+        failed = 0
+        results = iter_file_results(extract_skills, paths, workers=args.workers,
+                                    on_error=lambda path, error: (path, [], error))
+        for path, skills, error in results:
+            if error:
+                failed += 1
+                logger.error("Could not index %s: %s", path, error)
+                continue
+            index.add_skills(path, skills)
+        print(f"indexed {len(paths) - failed} resumes in {time.perf_counter() - start:.1f}s "
+              f"({failed} failed, {len(index)} in index)")
+    elif args.command == "search":
+        start = time.perf_counter()
+        results = index.search(args.role, args.k)
+        elapsed = (time.perf_counter() - start) * 1000
+        for rank, result in enumerate(results, 1):
+            print(f"{rank:>3}. {result['match_score']:5.1f}%  {result['resume']}  "
+                  f"({', '.join(result['matched_skills'])})")
+        print(f"{len(results)} results in {elapsed:.1f}ms")
+    else:
+        for key in args.keys:
+            if not index.remove(key):
+                print(f"not indexed: {key}")
+
+    index.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    main()
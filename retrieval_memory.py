@@ -0,0 +1,128 @@
+import re
+import math
+import threading
+from collections import Counter
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9_+#]*")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by can could do does for from had has have how i if in is it its "
+    "me my of on or our so than that the their them then there these they this to was we were "
+    "what when where which who why will with would you your".split()
+)
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class TurnMemory:
+    """Local TF-IDF index over conversation turns that left the prompt window.
+
+    Each turn (a user message and the replies that followed it) is indexed
+    as one document. ``search()`` returns the turns most similar to a query
+    by cosine similarity of sublinear TF-IDF vectors, so a prompt can carry
+    the older context that matters instead of everything or nothing.
+
+    Vectors are sparse dicts; weights are rebuilt lazily after the index
+    changes, which happens at most once per chat turn.
+    """
+
+    def __init__(self, max_turns=1000):
+        self.max_turns = max_turns
+
+        self._turns = []
+        self._df = Counter()
+        self._next_id = 0
+        self._weights = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._turns)
+
+    def mark(self):
+        """Return a marker for truncate() that undoes every later add()."""
+        with self._lock:
+            return self._next_id
+
+    def add(self, messages, token_counts):
+        groups = []
+        for message, tokens in zip(messages, token_counts):
+            if message["role"] == "user" or not groups:
+                groups.append(([], [0]))
+            groups[-1][0].append(message)
+            groups[-1][1][0] += tokens
+
+        with self._lock:
+            for group, tokens in groups:
+                terms = Counter(tokenize(" ".join(m.get("content") or "" for m in group)))
+                self._turns.append({"id": self._next_id, "messages": group, "tokens": tokens[0], "terms": terms})
+                self._df.update(terms.keys())
+                self._next_id += 1
+
+            while len(self._turns) > self.max_turns:
+                self._df.subtract(self._turns.pop(0)["terms"].keys())
+            self._weights = None
+
+    def truncate(self, mark):
+        with self._lock:
+            while self._turns and self._turns[-1]["id"] >= mark:
+                self._df.subtract(self._turns.pop()["terms"].keys())
+            self._weights = None
+
+    def clear(self):
+        with self._lock:
+            self._turns = []
+            self._df = Counter()
+            self._weights = None
+
+    def _idf(self, term):
+        return math.log((1 + len(self._turns)) / (1 + self._df[term])) + 1
+
+    def _build_weights(self):
+        weights = []
+        for turn in self._turns:
+            vector = {t: (1 + math.log(tf)) * self._idf(t) for t, tf in turn["terms"].items()}
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            weights.append({t: w / norm for t, w in vector.items()})
+        return weights
+
+    def search(self, text, k=3, max_tokens=None, min_score=0.05):
+        """Return up to ``k`` relevant turns, oldest first, as lists of messages.
+
+        Turns are taken best match first until ``max_tokens`` would be
+        exceeded.
+        """
+        terms = Counter(tokenize(text))
+        if not terms:
+            return []
+
+        with self._lock:
+            if self._weights is None:
+                self._weights = self._build_weights()
+
+            query = {t: (1 + math.log(tf)) * self._idf(t) for t, tf in terms.items() if self._df[t] > 0}
+            norm = math.sqrt(sum(w * w for w in query.values()))
+            if not norm:
+                return []
+
+            scored = []
+            for index, vector in enumerate(self._weights):
+                score = sum(w * vector.get(t, 0.0) for t, w in query.items()) / norm
+                if score >= min_score:
+                    scored.append((score, index))
+
+            scored.sort(reverse=True)
+            chosen = []
+            used = 0
+            for score, index in scored:
+                if len(chosen) == k:
+                    break
+                tokens = self._turns[index]["tokens"]
+                if max_tokens is not None and used + tokens > max_tokens:
+                    continue
+                used += tokens
+                chosen.append(index)
+
+            return [list(self._turns[index]["messages"]) for index in sorted(chosen)]
@@ -0,0 +1,251 @@
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+
+from scheduler import RETRYABLE_ERRORS
+
+
+logger = logging.getLogger(__name__)
+
+# Rules are checked in order; the first one whose conditions all hold picks
+# the model. Fallbacks are tried in order when the model fails with a
+# retryable error (429, 5xx, timeout, connection) or is cooling down after
+# missing its latency SLO. Other errors, such as a rejected prompt or a bad
+# key, would fail on every model and are raised straight away.
+DEFAULT_POLICY = [
+    {
+        "name": "teacher",
+        "personas": ["teacher"],
+        "model": "llama-3.3-70b-versatile",
+        "fallbacks": ["llama-3.1-8b-instant"]
+    },
+    {
+        "name": "long-context",
+        "min_prompt_tokens": 3000,
+        "model": "llama-3.3-70b-versatile",
+        "fallbacks": ["llama-3.1-8b-instant"]
+    },
+    {
+        "name": "short",
+        "model": "llama-3.1-8b-instant",
+        "fallbacks": ["llama-3.3-70b-versatile"]
+    },
+]
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (seconds)."""
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.total:
+            return None
+
+        rank = q * self.total
+        seen = 0
+        for bound, bucket_count in zip(self.BUCKETS + (float("inf"),), self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "buckets": dict(zip([str(b) for b in self.BUCKETS] + ["+Inf"], self.counts))
+        }
+
+
+class ModelRouter:
+    """Chooses a model per request from a policy table, with failover.
+
+    A rule may restrict ``personas`` and bound the prompt size with
+    ``min_prompt_tokens``/``max_prompt_tokens``. A model that errors, or
+    takes longer than ``latency_slo`` seconds to stream its first token, is
+    skipped for ``cooldown`` seconds while its fallbacks take the traffic.
+
+    Time to first token is the only latency held to the SLO: the wall time
+    of a non-streaming call grows with the length of the answer, so it is
+    kept in its own histogram for reference but never degrades a model.
+    """
+
+    def __init__(self, policy=None, latency_slo=5.0, cooldown=60.0, max_decisions=1000):
+        self.policy = policy or DEFAULT_POLICY
+        self.latency_slo = latency_slo
+        self.cooldown = cooldown
+
+        self.histograms = {"ttft": {}, "total": {}}
+        self.decisions = deque(maxlen=max_decisions)
+        self._degraded_until = {}
+        self._lock = threading.Lock()
+
+    def _match(self, prompt_tokens, persona):
+        for rule in self.policy:
+            if "personas" in rule and persona not in rule["personas"]:
+                continue
+            if prompt_tokens < rule.get("min_prompt_tokens", 0):
+                continue
+            if prompt_tokens > rule.get("max_prompt_tokens", float("inf")):
+                continue
+            return rule
+        return self.policy[-1]
+
+    def route(self, prompt_tokens, persona):
+        """Return the matching rule and its models in the order to try them."""
+        rule = self._match(prompt_tokens, persona)
+        candidates = [rule["model"]] + list(rule.get("fallbacks", []))
+
+        now = time.monotonic()
+        with self._lock:
+            healthy = [m for m in candidates if self._degraded_until.get(m, 0) <= now]
+        # If everything is cooling down, still try them all rather than fail outright.
+        return rule, healthy or candidates
+
+    def _record(self, rule, model, prompt_tokens, persona, latency, outcome, kind="ttft"):
+        slo = rule.get("latency_slo", self.latency_slo)
+
+        with self._lock:
+            if latency is not None:
+                self.histograms[kind].setdefault(model, LatencyHistogram()).observe(latency)
+            if outcome == "error" or (kind == "ttft" and latency is not None and latency > slo):
+                self._degraded_until[model] = time.monotonic() + self.cooldown
+
+            self.decisions.append({
+                "time": time.time(),
+                "rule": rule["name"],
+                "model": model,
+                "prompt_tokens": prompt_tokens,
+                "persona": persona,
+                "latency": latency,
+                "latency_kind": kind,
+                "outcome": outcome
+            })
+
+    def call(self, send, prompt_tokens, persona, stream=False):
+        """Call ``send(model)`` on the routed model, failing over on errors.
+
+        With ``stream`` the result is a stream of chunks instead, and a model
+        that fails before its first token is failed over too.
+        """
+        rule, models = self.route(prompt_tokens, persona)
+        if stream:
+            return self._stream(send, rule, models, prompt_tokens, persona)
+
+        for i, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                result = send(model)
+            except RETRYABLE_ERRORS as e:
+                self._record(rule, model, prompt_tokens, persona, None, "error")
+                if i == len(models) - 1:
+                    raise
+                logger.warning("Model %s failed (%s); failing over to %s", model, e, models[i + 1])
+                continue
+
+            self._record(rule, model, prompt_tokens, persona, time.perf_counter() - start, "ok", "total")
+            return result
+
+    def _stream(self, send, rule, models, prompt_tokens, persona):
+        for i, model in enumerate(models):
+            start = time.perf_counter()
+            stream = None
+            first = True
+            try:
+                stream = send(model)
+                for chunk in stream:
+                    if first and chunk.choices and chunk.choices[0].delta.content:
+                        first = False
+                        self._record(rule, model, prompt_tokens, persona, time.perf_counter() - start, "ok")
+                    yield chunk
+            except RETRYABLE_ERRORS as e:
+                self._record(rule, model, prompt_tokens, persona, None, "error")
+                # Once text has reached the caller the reply can't be restarted elsewhere.
+                if not first or i == len(models) - 1:
+                    raise
+                logger.warning("Model %s failed (%s); failing over to %s", model, e, models[i + 1])
+                continue
+            finally:
+                if stream is not None:
+                    stream.close()
+            return
+
+    async def acall(self, send, prompt_tokens, persona, stream=False):
+        """Async counterpart of call() where ``send(model)`` is a coroutine function."""
+        rule, models = self.route(prompt_tokens, persona)
+        if stream:
+            return _AsyncStream(self._astream(send, rule, models, prompt_tokens, persona))
+
+        for i, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                result = await send(model)
+            except RETRYABLE_ERRORS as e:
+                self._record(rule, model, prompt_tokens, persona, None, "error")
+                if i == len(models) - 1:
+                    raise
+                logger.warning("Model %s failed (%s); failing over to %s", model, e, models[i + 1])
+                continue
+
+            self._record(rule, model, prompt_tokens, persona, time.perf_counter() - start, "ok", "total")
+            return result
+
+    async def _astream(self, send, rule, models, prompt_tokens, persona):
+        for i, model in enumerate(models):
+            start = time.perf_counter()
+            stream = None
+            first = True
+            try:
+                stream = await send(model)
+                async for chunk in stream:
+                    if first and chunk.choices and chunk.choices[0].delta.content:
+                        first = False
+                        self._record(rule, model, prompt_tokens, persona, time.perf_counter() - start, "ok")
+                    yield chunk
+            except RETRYABLE_ERRORS as e:
+                self._record(rule, model, prompt_tokens, persona, None, "error")
+                # Once text has reached the caller the reply can't be restarted elsewhere.
+                if not first or i == len(models) - 1:
+                    raise
+                logger.warning("Model %s failed (%s); failing over to %s", model, e, models[i + 1])
+                continue
+            finally:
+                if stream is not None:
+                    await stream.close()
+            return
+
+    def stats(self):
+        with self._lock:
+            return {
+                kind: {model: h.snapshot() for model, h in histograms.items()}
+                for kind, histograms in self.histograms.items()
+            }
+
+
+class _AsyncStream:
+    # Gives the routed async generator the close() coroutine callers expect of a stream.
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._chunks
+
+    async def close(self):
+        await self._chunks.aclose()
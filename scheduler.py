@@ -0,0 +1,298 @@
+import re
+import time
+import heapq
+import random
+import asyncio
+import logging
+import threading
+from itertools import count
+
+import groq
+
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APIConnectionError,
+    groq.APITimeoutError,
+    groq.InternalServerError,
+)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value):
+    """Parse Groq reset durations such as ``"2m59.56s"``, ``"7.66s"`` or ``"120ms"``."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    """Client-side view of one server-side quota.
+
+    The bucket is calibrated from the limit/remaining/reset headers of each
+    response and refills linearly until the reported reset time. Until the
+    first response arrives it never blocks.
+    """
+
+    def __init__(self):
+        self.limit = None
+        self.tokens = None
+        self.refill_rate = 0.0
+        self.updated_at = time.monotonic()
+
+    def observe(self, limit, remaining, reset_seconds):
+        if limit is None or remaining is None:
+            return
+
+        now = time.monotonic()
+        self.limit = limit
+        self.tokens = remaining
+        if reset_seconds:
+            self.refill_rate = max(limit - remaining, 0) / reset_seconds
+        self.updated_at = now
+
+    def _refill(self, now):
+        if self.tokens is None:
+            return
+        self.tokens = min(self.limit, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, cost):
+        """Seconds until ``cost`` units are available (0 if they are now)."""
+        if self.tokens is None:
+            return 0.0
+
+        self._refill(time.monotonic())
+        cost = min(cost, self.limit)
+        if self.tokens >= cost:
+            return 0.0
+        if self.refill_rate <= 0:
+            return 1.0
+        return (cost - self.tokens) / self.refill_rate
+
+    def consume(self, cost):
+        if self.tokens is not None:
+            self.tokens -= cost
+
+
+class RequestScheduler:
+    """Admission control, fair queueing and retries for Groq calls.
+
+    Requests wait in a queue ordered by (priority, virtual start time), the
+    start-time fair queueing rule: each session's queued requests get
+    consecutive virtual times, so a session firing many requests only gets
+    its share while others are waiting. The head of the queue is admitted as
+    soon as both the request and token buckets allow it; away from the
+    limits this is immediate.
+
+    Retryable failures back off exponentially with jitter and honour the
+    server's ``Retry-After`` header.
+    """
+
+    def __init__(self, max_retries=4, base_delay=0.5, max_delay=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = count()
+        self._virtual_clock = 0
+        self._session_finish = {}
+        self._async_waiters = []
+
+        self.retries = 0
+        self.throttled = 0
+
+    def _enqueue(self, session_id, priority):
+        start = max(self._virtual_clock, self._session_finish.get(session_id, 0))
+        self._session_finish[session_id] = start + 1
+        ticket = (priority, start, next(self._seq))
+        heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _try_admit(self, ticket, cost, waited):
+        """Admit ``ticket`` if it heads the queue and the buckets allow it.
+
+        Returns 0 once admitted, otherwise the seconds to wait before trying
+        again (None: until woken).
+        """
+        if self._queue[0] is not ticket:
+            return None
+
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(cost))
+        if wait > 0:
+            return wait
+
+        heapq.heappop(self._queue)
+        self.requests.consume(1)
+        self.tokens.consume(cost)
+        self._virtual_clock = max(self._virtual_clock, ticket[1])
+        # A session whose last ticket finishes at or before the clock would be
+        # queued at the clock anyway, and with nothing queued no one is owed
+        # a place, so those entries carry nothing.
+        if not self._queue:
+            self._session_finish.clear()
+        else:
+            self._session_finish = {
+                session: finish for session, finish in self._session_finish.items()
+                if finish > self._virtual_clock
+            }
+        if waited:
+            self.throttled += 1
+        self._wake()
+        return 0
+
+    def _wake(self):
+        # Called with the condition held: wakes blocked threads and async waiters alike.
+        self._cond.notify_all()
+        for loop, future in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # the waiter's loop is closed
+        self._async_waiters.clear()
+
+    def acquire(self, session_id="default", priority=0, cost=1):
+        """Block until this request may be sent."""
+        with self._cond:
+            ticket = self._enqueue(session_id, priority)
+            waited = False
+            while True:
+                wait = self._try_admit(ticket, cost, waited)
+                if wait == 0:
+                    return
+                waited = True
+                self._cond.wait(timeout=wait)
+
+    async def aacquire(self, session_id="default", priority=0, cost=1):
+        """Async counterpart of acquire(); waits on the event loop, not in a thread."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            ticket = self._enqueue(session_id, priority)
+
+        waited = False
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(ticket, cost, waited)
+                    if wait == 0:
+                        return
+                    future = loop.create_future()
+                    self._async_waiters.append((loop, future))
+                waited = True
+                await asyncio.wait([future], timeout=wait)
+        except BaseException:
+            # Cancelled while queued: give up the place so the queue moves on.
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._wake()
+            raise
+
+    def observe(self, headers):
+        """Recalibrate the buckets from a response's rate-limit headers."""
+        def number(name):
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        with self._cond:
+            self.requests.observe(
+                number("x-ratelimit-limit-requests"),
+                number("x-ratelimit-remaining-requests"),
+                parse_duration(headers.get("x-ratelimit-reset-requests"))
+            )
+            self.tokens.observe(
+                number("x-ratelimit-limit-tokens"),
+                number("x-ratelimit-remaining-tokens"),
+                parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            )
+            self._wake()
+
+    def _backoff(self, attempt, error):
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+
+        response = getattr(error, "response", None)
+        if response is not None:
+            self.observe(response.headers)
+            retry_after = parse_duration(response.headers.get("retry-after"))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+        return delay
+
+    def create(self, client, params, session_id="default", priority=0, estimated_tokens=0):
+        """Send a chat completion through the scheduler and return the parsed response."""
+        cost = max(estimated_tokens, 1)
+        client = client.with_options(max_retries=0)
+
+        for attempt in range(self.max_retries + 1):
+            self.acquire(session_id, priority, cost)
+            try:
+                raw = client.chat.completions.with_raw_response.create(**params)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                self.retries += 1
+                logger.warning("Groq request failed (%s); retrying in %.1fs", e, delay)
+                time.sleep(delay)
+                continue
+
+            self.observe(raw.headers)
+            return raw.parse()
+
+    async def acreate(self, client, params, session_id="default", priority=0, estimated_tokens=0):
+        """Async counterpart of create() for AsyncGroq clients."""
+        cost = max(estimated_tokens, 1)
+        client = client.with_options(max_retries=0)
+
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(session_id, priority, cost)
+            try:
+                raw = await client.chat.completions.with_raw_response.create(**params)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                self.retries += 1
+                logger.warning("Groq request failed (%s); retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            self.observe(raw.headers)
+            return await raw.parse()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "remaining_requests": self.requests.tokens,
+                "remaining_tokens": self.tokens.tokens
+            }
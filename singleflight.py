@@ -0,0 +1,235 @@
+import asyncio
+import threading
+
+
+class Abandoned(Exception):
+    """The leading call stopped without a result (e.g. its stream was closed)."""
+
+
+class _Call:
+    """One in-flight call; followers can wait for the result or follow its parts."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.parts = []
+        self.followers = 0
+        self.done = False
+        self.result = None
+        self.error = None
+
+    def publish(self, part):
+        with self._cond:
+            self.parts.append(part)
+            self._cond.notify_all()
+
+    def settle(self, result=None, error=None):
+        with self._cond:
+            if result and not self.parts:
+                # A non-streaming leader: followers replay the whole reply at once.
+                self.parts.append(result)
+            self.result = result
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    def wait(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def follow(self):
+        """Yield the leader's parts as they are published, then stop or raise."""
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.done or len(self.parts) > index)
+                parts = self.parts[index:]
+                done = self.done
+            index += len(parts)
+            yield from parts
+            if done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class _AsyncCall:
+    def __init__(self):
+        self._changed = asyncio.Event()
+        self.parts = []
+        self.followers = 0
+        self.done = False
+        self.result = None
+        self.error = None
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, part):
+        self.parts.append(part)
+        self._notify()
+
+    def settle(self, result=None, error=None):
+        if result and not self.parts:
+            self.parts.append(result)
+        self.result = result
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def wait(self):
+        while not self.done:
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    async def follow(self):
+        index = 0
+        while True:
+            while not self.done and len(self.parts) == index:
+                await self._changed.wait()
+            parts = self.parts[index:]
+            index += len(parts)
+            for part in parts:
+                yield part
+            if self.done and index == len(self.parts):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one upstream call.
+
+    The first caller for a key becomes the leader and does the work; callers
+    that arrive while it is in flight share its result, or its error. Once
+    the leader settles the key is released, so later callers start afresh.
+
+    Streaming leaders ``publish()`` each part so followers can replay the
+    reply as it is generated. A leader that stops early calls ``abandon()``,
+    which only drops the call if nobody is following it; followers that stop
+    early call ``leave()`` so they no longer count. Followers of a call that
+    ends without a result see ``Abandoned`` and should send their own
+    request.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.coalesced = 0
+
+    def begin(self, key):
+        """Return ``(call, is_leader)`` for ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                return call, False
+
+            call = _Call()
+            self._calls[key] = call
+            self.leaders += 1
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.settle(result, error)
+
+    def leave(self, call):
+        """Stop following ``call``, e.g. because the follower's reader went away."""
+        with self._lock:
+            call.followers -= 1
+
+    def abandon(self, key, call):
+        """Give up a call the leader can no longer finish.
+
+        Returns False, leaving the call in flight, if followers are waiting on
+        it; the leader should then finish it on their behalf.
+        """
+        with self._lock:
+            if call.followers:
+                return False
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.settle(error=Abandoned())
+        return True
+
+    def do(self, key, fn):
+        call, leader = self.begin(key)
+        if not leader:
+            try:
+                return call.wait()
+            except Abandoned:
+                return fn()
+            finally:
+                self.leave(call)
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e if isinstance(e, Exception) else Abandoned())
+            raise
+        self.finish(key, call, result=result)
+        return result
+
+    def abegin(self, key):
+        """Async counterpart of begin(); must be called from the event loop."""
+        call = self._async_calls.get(key)
+        if call is not None:
+            call.followers += 1
+            self.coalesced += 1
+            return call, False
+
+        call = _AsyncCall()
+        self._async_calls[key] = call
+        self.leaders += 1
+        return call, True
+
+    def afinish(self, key, call, result=None, error=None):
+        if self._async_calls.get(key) is call:
+            del self._async_calls[key]
+        call.settle(result, error)
+
+    def aleave(self, call):
+        call.followers -= 1
+
+    def aabandon(self, key, call):
+        if call.followers:
+            return False
+        self.afinish(key, call, error=Abandoned())
+        return True
+
+    async def ado(self, key, coro_fn):
+        call, leader = self.abegin(key)
+        if not leader:
+            try:
+                return await call.wait()
+            except Abandoned:
+                return await coro_fn()
+            finally:
+                self.aleave(call)
+
+        try:
+            result = await coro_fn()
+        except BaseException as e:
+            self.afinish(key, call, error=e if isinstance(e, Exception) else Abandoned())
+            raise
+        self.afinish(key, call, result=result)
+        return result
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls) + len(self._async_calls)
+        }
@@ -0,0 +1,86 @@
+from collections import deque
+from functools import lru_cache
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class SkillMatcher:
+    """Finds every skill of a taxonomy in one pass over a text.
+
+    The skills are compiled into an Aho-Corasick automaton, so matching
+    costs one transition per character however many skills there are.
+    Matching is case-insensitive and only whole terms count: where a skill
+    starts or ends with a letter, digit or underscore, the text must not
+    continue with another one, so "java" does not match inside "javascript"
+    and "git" not inside "digital", while "c++" still matches in "c++17".
+    Overlapping skills are all reported ("data visualization" and
+    "visualization").
+    """
+
+    def __init__(self, skills):
+        self.skills = tuple(sorted({s.lower() for s in skills if s}))
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        for skill in self.skills:
+            state = 0
+            for char in skill:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = (skill,)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    @classmethod
+    @lru_cache(maxsize=16)
+    def for_skills(cls, skills):
+        """Shared matcher for a tuple of skills, compiled on first use."""
+        return cls(skills)
+
+    def finditer(self, text):
+        """Yield ``(skill, start, end)`` for every whole-term match, in text order of ``end``."""
+        lower = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        length = len(lower)
+        state = 0
+
+        for index, char in enumerate(lower):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for skill in output[state]:
+                end = index + 1
+                start = end - len(skill)
+                if start > 0 and _is_word_char(lower[start - 1]) and _is_word_char(skill[0]):
+                    continue
+                if end < length and _is_word_char(lower[end]) and _is_word_char(skill[-1]):
+                    continue
+                yield skill, start, end
+
+    def find(self, text):
+        """Map each skill found in ``text`` to the list of its ``(start, end)`` positions."""
+        found = {}
+        for skill, start, end in self.finditer(text):
+            found.setdefault(skill, []).append((start, end))
+        return found
@@ -0,0 +1,413 @@
+"""Regression tests for ATS scoring.
+
+EXPECTED holds calculate_ats_score() results produced by the original
+component-by-component implementation, which ran one regex pass per
+component. The single-scan feature extraction must reproduce them exactly,
+whether it is given text or a shared ResumeDocument.
+"""
+import pytest
+
+from resume_analyzer import ResumeAnalyzer
+
+
+LONG_BULLETS = "\n".join(
+    f"- Collaborated with the product team on feature {i}, tested releases and communicated status weekly."
+    for i in range(1, 25)
+)
+
+RESUMES = {
+    "quantified_backend": (
+        "backend developer",
+        """John Smith
+john@example.com | +1 555 0100
+
+Summary
+Backend engineer with 6 years of experience building Python and Node.js services.
+
+Skills
+Python, Django, Flask, SQL, MongoDB, REST API, GraphQL, Docker
+
+Experience
+Senior Backend Engineer, Acme Corp (2019 - present)
+- Designed and built a REST API handling 1.2M requests per day for 50000 users.
+- Reduced p99 latency by 40% and cut hosting costs by $120,000 per year.
+- Led a team of 5 team members and mentored 3 employees.
+- Delivered 12 projects and automated 30 tasks with CI pipelines.
+
+Education
+B.S. Computer Science, 2017
+
+Projects
+Open-source GraphQL gateway used by 200 customers.
+""",
+    ),
+    "years_and_clients": (
+        "data analyst",
+        """Priya Patel
+Data Analyst | 3 yrs experience
+
+Skills: Excel, SQL, Tableau, Power BI, statistics, pandas
+
+Work Experience
+Analyzed sales data for 15 clients and improved forecast accuracy by 12 %.
+Created 40 dashboards; streamlined reporting for 2 years across 4 regions.
+Managed budgets of $2.5M and increased retention 8%.
+
+Certifications
+Google Data Analytics Certificate
+
+Education
+M.Sc. Statistics
+""",
+    ),
+    "no_numbers_or_sections": (
+        "frontend developer",
+        "I like making websites with html and css. I know some javascript and react and git.",
+    ),
+    "special_characters": (
+        "devops engineer",
+        """*** DEVOPS *** ~~ engineer ~~ !!!
+@@@ docker ### kubernetes $$$ aws %%% linux ^^^ terraform &&& jenkins
+`ci/cd` `git` `azure` !!! *** ~~~ @@@ ### $$$ %%% ^^^ &&& ***
+experience: deployed, automated, optimized, integrated, debugged
+""",
+    ),
+    "long_resume": (
+        "qa engineer",
+        "Alex Kim\n\nSkills\nSelenium, Python, Jira, Jenkins, API testing, manual testing, automation, "
+        "test cases\n\nExperience\nQA Engineer at Beta Inc for 4 years\n" + LONG_BULLETS +
+        "\n- Executed 600 test cases and reduced escaped defects by 25%.\n\nEducation\nB.E. Electronics\n\n"
+        "Awards\nQuality Champion 2022\n\nInterests\nChess\n",
+    ),
+    "unknown_role_falls_back": (
+        "astronaut",
+        """Sam Lee
+Skills: C++, Java, algorithms, data structures, object-oriented programming, git
+Experience: implemented a compiler in 3 months; optimized builds by 20%; 10 features shipped.
+Education: BS CS
+Projects: ray tracer
+""",
+    ),
+    "empty": ("python developer", ""),
+}
+
+# One quantity pattern each, so a change to any single pattern shows up.
+for name, line in {
+    "percent_only": "Improved conversion by 18% through A/B tests.",
+    "years_only": "Software developer with 7 years building web apps.",
+    "dollars_only": "Saved $45000 in cloud spend.",
+    "users_only": "Scaled the platform to 300 customers and 9000 users.",
+    "projects_only": "Shipped 14 features across 3 projects.",
+    "team_size_only": "Led 8 team members and hired 2 employees.",
+}.items():
+    RESUMES[name] = ("software engineer", "Experience\n" + line + "\n")
+
+
+EXPECTED = {'dollars_only': {'breakdown': {'action_verbs': {'found': [], 'max': 10, 'score': 0},
+                                'formatting': {'issues': ['Resume too short (under 300 words)'],
+                                               'max': 20,
+                                               'score': 10},
+                                'keyword_match': {'matched_skills': [], 'max': 40, 'score': 0.0},
+                                'quantification': {'examples': ['$45000', '45000'],
+                                                   'max': 10,
+                                                   'score': 5.0},
+                                'sections': {'found': ['experience'], 'max': 20, 'score': 5.0}},
+                  'score': 20,
+                  'suggestions': ['Add missing technical skills like python, java, c++, git, sql.',
+                                  'Add a dedicated Education section.',
+                                  'Use more strong action verbs like Developed, Implemented, '
+                                  'Built, Optimized.',
+                                  'Include measurable achievements with numbers, percentages, or '
+                                  'metrics.',
+                                  'Resume too short (under 300 words).']},
+ 'empty': {'breakdown': {'action_verbs': {'found': [], 'max': 10, 'score': 0},
+                         'formatting': {'issues': ['Resume too short (under 300 words)'],
+                                        'max': 20,
+                                        'score': 10},
+                         'keyword_match': {'matched_skills': [], 'max': 40, 'score': 0.0},
+                         'quantification': {'examples': [], 'max': 10, 'score': 0.0},
+                         'sections': {'found': [], 'max': 20, 'score': 0.0}},
+           'score': 10,
+           'suggestions': ['Add missing technical skills like python, django, flask, sql, git.',
+                           'Add a dedicated Education section.',
+                           'Use more strong action verbs like Developed, Implemented, Built, '
+                           'Optimized.',
+                           'Include measurable achievements with numbers, percentages, or metrics.',
+                           'Resume too short (under 300 words).']},
+ 'long_resume': {'breakdown': {'action_verbs': {'found': ['executed',
+                                                          'reduced',
+                                                          'tested',
+                                                          'collaborated',
+                                                          'communicated'],
+                                                'max': 10,
+                                                'score': 10},
+                               'formatting': {'issues': ['Resume could be more detailed'],
+                                              'max': 20,
+                                              'score': 15},
+                               'keyword_match': {'matched_skills': ['selenium',
+                                                                    'test cases',
+                                                                    'automation',
+                                                                    'manual testing',
+                                                                    'jira',
+                                                                    'python',
+                                                                    'api testing',
+                                                                    'jenkins'],
+                                                 'max': 40,
+                                                 'score': 40.0},
+                               'quantification': {'examples': ['25%', 'years', '4'],
+                                                  'max': 10,
+                                                  'score': 10.0},
+                               'sections': {'found': ['education', 'skills', 'experience'],
+                                            'max': 20,
+                                            'score': 20.0}},
+                 'score': 95,
+                 'suggestions': ['Resume could be more detailed.']},
+ 'no_numbers_or_sections': {'breakdown': {'action_verbs': {'found': [], 'max': 10, 'score': 0},
+                                          'formatting': {'issues': ['Resume too short (under 300 '
+                                                                    'words)'],
+                                                         'max': 20,
+                                                         'score': 10},
+                                          'keyword_match': {'matched_skills': ['html',
+                                                                               'css',
+                                                                               'javascript',
+                                                                               'react',
+                                                                               'git'],
+                                                            'max': 40,
+                                                            'score': 22.2},
+                                          'quantification': {'examples': [],
+                                                             'max': 10,
+                                                             'score': 0.0},
+                                          'sections': {'found': [], 'max': 20, 'score': 0.0}},
+                            'score': 32,
+                            'suggestions': ['Add missing technical skills like vue, angular, '
+                                            'responsive design, bootstrap.',
+                                            'Add a dedicated Education section.',
+                                            'Use more strong action verbs like Developed, '
+                                            'Implemented, Built, Optimized.',
+                                            'Include measurable achievements with numbers, '
+                                            'percentages, or metrics.',
+                                            'Resume too short (under 300 words).']},
+ 'percent_only': {'breakdown': {'action_verbs': {'found': ['improved'], 'max': 10, 'score': 2},
+                                'formatting': {'issues': ['Resume too short (under 300 words)'],
+                                               'max': 20,
+                                               'score': 10},
+                                'keyword_match': {'matched_skills': [], 'max': 40, 'score': 0.0},
+                                'quantification': {'examples': ['18%', '18'],
+                                                   'max': 10,
+                                                   'score': 5.0},
+                                'sections': {'found': ['experience'], 'max': 20, 'score': 5.0}},
+                  'score': 22,
+                  'suggestions': ['Add missing technical skills like python, java, c++, git, sql.',
+                                  'Add a dedicated Education section.',
+                                  'Use more strong action verbs like Developed, Implemented, '
+                                  'Built, Optimized.',
+                                  'Include measurable achievements with numbers, percentages, or '
+                                  'metrics.',
+                                  'Resume too short (under 300 words).']},
+ 'projects_only': {'breakdown': {'action_verbs': {'found': [], 'max': 10, 'score': 0},
+                                 'formatting': {'issues': ['Resume too short (under 300 words)'],
+                                                'max': 20,
+                                                'score': 10},
+                                 'keyword_match': {'matched_skills': [], 'max': 40, 'score': 0.0},
+                                 'quantification': {'examples': ['features', 'projects', '14'],
+                                                    'max': 10,
+                                                    'score': 7.5},
+                                 'sections': {'found': ['experience', 'projects'],
+                                              'max': 20,
+                                              'score': 10.0}},
+                   'score': 27,
+                   'suggestions': ['Add missing technical skills like python, java, c++, git, sql.',
+                                   'Add a dedicated Education section.',
+                                   'Use more strong action verbs like Developed, Implemented, '
+                                   'Built, Optimized.',
+                                   'Resume too short (under 300 words).']},
+ 'quantified_backend': {'breakdown': {'action_verbs': {'found': ['designed',
+                                                                 'built',
+                                                                 'led',
+                                                                 'delivered',
+                                                                 'reduced'],
+                                                       'max': 10,
+                                                       'score': 10},
+                                      'formatting': {'issues': ['Resume too short (under 300 '
+                                                                'words)'],
+                                                     'max': 20,
+                                                     'score': 10},
+                                      'keyword_match': {'matched_skills': ['python',
+                                                                           'node.js',
+                                                                           'django',
+                                                                           'flask',
+                                                                           'sql',
+                                                                           'mongodb',
+                                                                           'rest api',
+                                                                           'graphql'],
+                                                        'max': 40,
+                                                        'score': 32.0},
+                                      'quantification': {'examples': ['40%', 'years', '$120'],
+                                                         'max': 10,
+                                                         'score': 10.0},
+                                      'sections': {'found': ['education',
+                                                             'skills',
+                                                             'experience',
+                                                             'projects'],
+                                                   'max': 20,
+                                                   'score': 20.0}},
+                        'score': 82,
+                        'suggestions': ['Resume too short (under 300 words).']},
+ 'special_characters': {'breakdown': {'action_verbs': {'found': ['optimized',
+                                                                 'automated',
+                                                                 'integrated',
+                                                                 'deployed',
+                                                                 'debugged'],
+                                                       'max': 10,
+                                                       'score': 10},
+                                      'formatting': {'issues': ['Resume too short (under 300 '
+                                                                'words)',
+                                                                'Too many special characters'],
+                                                     'max': 20,
+                                                     'score': 5},
+                                      'keyword_match': {'matched_skills': ['docker',
+                                                                           'kubernetes',
+                                                                           'jenkins',
+                                                                           'aws',
+                                                                           'azure',
+                                                                           'linux',
+                                                                           'terraform',
+                                                                           'git',
+                                                                           'ci/cd'],
+                                                        'max': 40,
+                                                        'score': 40.0},
+                                      'quantification': {'examples': [], 'max': 10, 'score': 0.0},
+                                      'sections': {'found': ['experience'],
+                                                   'max': 20,
+                                                   'score': 5.0}},
+                        'score': 60,
+                        'suggestions': ['Add a dedicated Education section.',
+                                        'Include measurable achievements with numbers, '
+                                        'percentages, or metrics.',
+                                        'Resume too short (under 300 words).',
+                                        'Too many special characters.']},
+ 'team_size_only': {'breakdown': {'action_verbs': {'found': ['led'], 'max': 10, 'score': 2},
+                                  'formatting': {'issues': ['Resume too short (under 300 words)'],
+                                                 'max': 20,
+                                                 'score': 10},
+                                  'keyword_match': {'matched_skills': [], 'max': 40, 'score': 0.0},
+                                  'quantification': {'examples': ['team members', 'employees', '8'],
+                                                     'max': 10,
+                                                     'score': 7.5},
+                                  'sections': {'found': ['experience'], 'max': 20, 'score': 5.0}},
+                    'score': 24,
+                    'suggestions': ['Add missing technical skills like python, java, c++, git, '
+                                    'sql.',
+                                    'Add a dedicated Education section.',
+                                    'Use more strong action verbs like Developed, Implemented, '
+                                    'Built, Optimized.',
+                                    'Resume too short (under 300 words).']},
+ 'unknown_role_falls_back': {'breakdown': {'action_verbs': {'found': ['implemented', 'optimized'],
+                                                            'max': 10,
+                                                            'score': 4},
+                                           'formatting': {'issues': ['Resume too short (under 300 '
+                                                                     'words)'],
+                                                          'max': 20,
+                                                          'score': 10},
+                                           'keyword_match': {'matched_skills': ['java',
+                                                                                'c++',
+                                                                                'git',
+                                                                                'data structures',
+                                                                                'algorithms',
+                                                                                'object-oriented '
+                                                                                'programming'],
+                                                             'max': 40,
+                                                             'score': 30.0},
+                                           'quantification': {'examples': ['20%', 'features', '3'],
+                                                              'max': 10,
+                                                              'score': 10.0},
+                                           'sections': {'found': ['education',
+                                                                  'skills',
+                                                                  'experience',
+                                                                  'projects'],
+                                                        'max': 20,
+                                                        'score': 20.0}},
+                             'score': 74,
+                             'suggestions': ['Use more strong action verbs like Developed, '
+                                             'Implemented, Built, Optimized.',
+                                             'Resume too short (under 300 words).']},
+ 'users_only': {'breakdown': {'action_verbs': {'found': [], 'max': 10, 'score': 0},
+                              'formatting': {'issues': ['Resume too short (under 300 words)'],
+                                             'max': 20,
+                                             'score': 10},
+                              'keyword_match': {'matched_skills': [], 'max': 40, 'score': 0.0},
+                              'quantification': {'examples': ['customers', 'users', '300'],
+                                                 'max': 10,
+                                                 'score': 7.5},
+                              'sections': {'found': ['experience'], 'max': 20, 'score': 5.0}},
+                'score': 22,
+                'suggestions': ['Add missing technical skills like python, java, c++, git, sql.',
+                                'Add a dedicated Education section.',
+                                'Use more strong action verbs like Developed, Implemented, Built, '
+                                'Optimized.',
+                                'Resume too short (under 300 words).']},
+ 'years_and_clients': {'breakdown': {'action_verbs': {'found': ['created',
+                                                                'analyzed',
+                                                                'managed',
+                                                                'improved',
+                                                                'increased'],
+                                                      'max': 10,
+                                                      'score': 10},
+                                     'formatting': {'issues': ['Resume too short (under 300 '
+                                                               'words)'],
+                                                    'max': 20,
+                                                    'score': 10},
+                                     'keyword_match': {'matched_skills': ['pandas',
+                                                                          'sql',
+                                                                          'excel',
+                                                                          'power bi',
+                                                                          'tableau',
+                                                                          'statistics'],
+                                                       'max': 40,
+                                                       'score': 26.7},
+                                     'quantification': {'examples': ['8%', 'yrs', 'years'],
+                                                        'max': 10,
+                                                        'score': 10.0},
+                                     'sections': {'found': ['education', 'skills', 'experience'],
+                                                  'max': 20,
+                                                  'score': 17.5}},
+                       'score': 74,
+                       'suggestions': ['Add missing technical skills like python, numpy, '
+                                       'visualization.',
+                                       'Resume too short (under 300 words).']},
+ 'years_only': {'breakdown': {'action_verbs': {'found': [], 'max': 10, 'score': 0},
+                              'formatting': {'issues': ['Resume too short (under 300 words)'],
+                                             'max': 20,
+                                             'score': 10},
+                              'keyword_match': {'matched_skills': [], 'max': 40, 'score': 0.0},
+                              'quantification': {'examples': ['years', '7'],
+                                                 'max': 10,
+                                                 'score': 5.0},
+                              'sections': {'found': ['experience'], 'max': 20, 'score': 5.0}},
+                'score': 20,
+                'suggestions': ['Add missing technical skills like python, java, c++, git, sql.',
+                                'Add a dedicated Education section.',
+                                'Use more strong action verbs like Developed, Implemented, Built, '
+                                'Optimized.',
+                                'Include measurable achievements with numbers, percentages, or '
+                                'metrics.',
+                                'Resume too short (under 300 words).']}}
+
+
+@pytest.mark.parametrize("name", sorted(RESUMES))
+def test_ats_score_matches_reference(name):
+    job_role, text = RESUMES[name]
+    assert ResumeAnalyzer().calculate_ats_score(text, job_role) == EXPECTED[name]
+
+
+@pytest.mark.parametrize("name", sorted(RESUMES))
+def test_ats_score_from_shared_document(name):
+    job_role, text = RESUMES[name]
+    analyzer = ResumeAnalyzer()
+    document = analyzer.document(text)
+
+    # Earlier stages fill the document's caches; scoring must not depend on them.
+    analyzer.match_skills(document, job_role)
+    assert analyzer.calculate_ats_score(document, job_role) == EXPECTED[name]
+    # The second call is served from the document's memoized features.
+    assert analyzer.calculate_ats_score(document, job_role) == EXPECTED[name]
@@ -0,0 +1,38 @@
+"""Tests for SkillMatcher's whole-term matching."""
+import pytest
+
+from skill_matcher import SkillMatcher
+
+
+SKILLS = ["Java", "JavaScript", "Git", "C++", "Data Visualization", "Visualization", "Node.js"]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return SkillMatcher(SKILLS)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("JavaScript and TypeScript", {"javascript"}),
+    ("Java, JavaScript", {"java", "javascript"}),
+    ("digital marketing", set()),
+    ("git, GitHub Actions", {"git"}),
+    ("version control with Git.", {"git"}),
+    ("modern C++17 codebases", {"c++"}),
+    ("Objective-C and C++", {"c++"}),
+    ("node.js services", {"node.js"}),
+])
+def test_whole_terms_only(matcher, text, expected):
+    assert set(matcher.find(text)) == expected
+
+
+def test_overlapping_skills_are_all_reported(matcher):
+    found = matcher.find("Data visualization dashboards")
+
+    assert found == {"data visualization": [(0, 18)], "visualization": [(5, 18)]}
+
+
+def test_positions_of_repeated_matches(matcher):
+    found = matcher.find("git ... GIT ... legit")
+
+    assert found == {"git": [(0, 3), (8, 11)]}